@@ -7,22 +7,34 @@ Run with:
 """
 
 import streamlit as st
-import pandas as pd
-import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
+from src.startup import run_in_background, startup_metrics  # stdlib only; times the imports below
+
+with startup_metrics.phase('import: numpy/pandas'):
+    import pandas as pd
+    import numpy as np
+with startup_metrics.phase('import: plotly'):
+    import plotly.express as px
+    import plotly.graph_objects as go
 import joblib
 import json
-import shap
+from functools import partial
 from pathlib import Path
-from PIL import Image
-from sklearn.metrics import (
-    confusion_matrix, roc_curve, roc_auc_score,
-    precision_recall_curve, auc, precision_score, recall_score
-)
 import warnings
 warnings.filterwarnings('ignore')
 
+from src.application_scoring import (
+    CALCULATOR_INPUTS, ScoringTemplate, assign_risk_band, read_applications, score_applications
+)
+from src.calibration import load_current_table
+from src.categorical_encoding import load_current_encoder
+from src.chart_data import class_histograms
+from src.column_store import ColumnStore, convert_csv_to_columns, store_is_current
+from src.file_cache import FileCache, file_signature, read_file_chunked, read_json, read_text
+from src.image_assets import ImageAssetCache
+from src.metrics_engine import get_discrimination_metrics
+from src.portfolio_export import EXPORT_FORMATS, export_flagged
+from src.threshold_index import ThresholdIndex
+
 
 # =====================================================================
 # Page Configuration
@@ -79,6 +91,13 @@ except NameError:
 MODEL_PATH = BASE_PATH / 'models'
 REPORTS_PATH = BASE_PATH / 'reports'
 DOCS_PATH = BASE_PATH / 'docs' / 'screenshots'
+TEST_STORE_PATH = BASE_PATH / 'test_dashboard_store'
+
+# Audit logs above this size are downloaded gzip-compressed
+AUDIT_GZIP_BYTES = 5 * 1024 * 1024
+
+# Columns of test_dashboard.csv the dashboard reads (projected into the column store)
+TEST_COLUMNS = ['SK_ID_CURR', 'TARGET', 'predicted_pd', 'AMT_CREDIT']
 
 
 # =====================================================================
@@ -86,26 +105,107 @@ DOCS_PATH = BASE_PATH / 'docs' / 'screenshots'
 # =====================================================================
 @st.cache_resource
 def load_model_artifacts():
-    """Load XGBoost model, thresholds, and feature names."""
-    model = joblib.load(MODEL_PATH / 'xgb_credit_model.pkl')
+    """Load thresholds and feature names (lightweight; needed for first paint)."""
     thresholds = joblib.load(MODEL_PATH / 'thresholds.pkl')
     feature_names = joblib.load(MODEL_PATH / 'feature_names.pkl')
-    return model, thresholds, feature_names
+    return thresholds, feature_names
+
+
+@st.cache_resource
+def load_model_async():
+    """Load the XGBoost model on a background thread (imports xgboost; first needed by the calculator)."""
+    return run_in_background(lambda: joblib.load(MODEL_PATH / 'xgb_credit_model.pkl'), 'model-load')
 
 
 @st.cache_resource
 def load_risk_calculator_deps():
-    """Load label encoders and medians for the risk calculator."""
-    le = joblib.load(MODEL_PATH / 'label_encoders_v2.pkl')
+    """Load the compiled categorical encoder, modes and medians for the risk calculator."""
+    encoder = load_current_encoder(MODEL_PATH / 'categorical_encoders.json')
     modes = joblib.load(MODEL_PATH / 'categorical_modes.pkl')
     medians = pd.read_csv(MODEL_PATH / 'population_medians.csv', index_col=0).squeeze()
-    return le, modes, medians
+    return encoder, modes, medians
 
 
-@st.cache_data
+@st.cache_resource
+def load_scoring_template():
+    """Compile the calculator's feature-vector template once (medians, encoded modes, column map)."""
+    encoder, modes, medians = load_risk_calculator_deps()
+    _, names = load_model_artifacts()
+    return ScoringTemplate(names, medians, encoder, modes)
+
+
+@st.cache_resource
+def load_calibration_table():
+    """
+    Compiled isotonic calibration (raw -> calibrated PD), shared by the calculator and batch scoring.
+
+    Raises if the table was compiled for a different model or calibrator (not cached).
+    """
+    return load_current_table(MODEL_PATH)
+
+
+@st.cache_resource
 def load_test_data():
-    """Load the pre-computed test set with predictions."""
-    return pd.read_csv(BASE_PATH / 'test_dashboard.csv')
+    """
+    Memory-map the pre-computed test set with predictions.
+
+    test_dashboard.csv is converted once into a per-column store holding only the
+    columns the dashboard reads; the store is rebuilt if the CSV changes.
+    """
+    csv_path = BASE_PATH / 'test_dashboard.csv'
+    if not store_is_current(TEST_STORE_PATH, csv_path):
+        convert_csv_to_columns(csv_path, TEST_STORE_PATH, columns=TEST_COLUMNS)
+    return ColumnStore(TEST_STORE_PATH)
+
+
+@st.cache_resource
+def build_threshold_index(avg_loan):
+    """Sort the test-set PDs once and precompute prefix sums for threshold lookups."""
+    store = load_test_data()
+    if 'AMT_CREDIT' in store:
+        ead = store['AMT_CREDIT']
+    else:
+        ead = np.full(len(store), avg_loan)
+    return ThresholdIndex(store['predicted_pd'], store['TARGET'], ead)
+
+
+@st.cache_resource
+def load_score_histograms():
+    """Fixed-bin PD histogram counts per class for the distribution chart (once per dataset)."""
+    store = load_test_data()
+    return class_histograms(store['predicted_pd'], store['TARGET'])
+
+
+@st.cache_resource
+def load_discrimination_metrics(store_signature, model_version):
+    """
+    Threshold-independent metrics for the test set, once per store build and model version.
+
+    Keyed on the column-store manifest, so a rerun neither rehashes the score and
+    label columns nor touches the metrics engine's own memo.
+    """
+    store = load_test_data()
+    return get_discrimination_metrics(store['predicted_pd'], store['TARGET'], model_version)
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def build_flagged_export(threshold, fmt):
+    """Flagged-loan export for one threshold and format, built on first download click only."""
+    store = load_test_data()
+    return export_flagged(store, threshold, [c for c in TEST_COLUMNS if c in store], fmt)
+
+
+@st.cache_resource
+def load_image_cache():
+    """Process-wide cache of decoded, display-sized report images (keyed by path + mtime)."""
+    return ImageAssetCache()
+
+
+def report_image(path):
+    """PNG bytes for ``st.image``: cached thumbnail, or the original file when full resolution is on."""
+    if st.session_state.get('full_res_images', False):
+        return ImageAssetCache.full_resolution(path)
+    return load_image_cache().thumbnail(path)
 
 
 @st.cache_data
@@ -118,43 +218,57 @@ def load_model_card():
     return None
 
 
+@st.cache_resource
+def load_file_cache():
+    """Process-wide cache for files rewritten by surveillance runs (keyed by path, mtime, size)."""
+    return FileCache()
+
+
 def load_agent_output():
-    """Load latest AI agent surveillance output (not cached, reflects most recent run)."""
-    agent_path = REPORTS_PATH / 'agent_output_latest.json'
-    if agent_path.exists():
-        with open(agent_path, encoding="utf-8") as f:
-            return json.load(f)
-    return None
+    """Load latest AI agent surveillance output (re-parsed only when the run rewrites the file)."""
+    return load_file_cache().load(REPORTS_PATH / 'agent_output_latest.json', read_json)
 
 
 @st.cache_resource
-def load_shap_explainer():
-    """Build SHAP TreeExplainer on the loaded model (cached, expensive to create)."""
-    _model, _, _ = load_model_artifacts()
-    return shap.TreeExplainer(_model)
+def load_shap_explainer_async():
+    """Import shap and build the TreeExplainer on a background thread (only the calculator needs it)."""
+    model_future = load_model_async()
+
+    def build():
+        # Wait for the model first: importing shap while the model thread is still
+        # importing xgboost/sklearn races on scipy's lazily loaded submodules
+        model = model_future.result()
+        import shap
+        return shap.TreeExplainer(model)
+
+    return run_in_background(build, 'shap-explainer')
 
 
 # Load everything
 try:
-    model, thresholds, feature_names = load_model_artifacts()
+    thresholds, feature_names = load_model_artifacts()
     df_test = load_test_data()
     model_card = load_model_card()
     agent_output = load_agent_output()
-    shap_explainer = load_shap_explainer()
     BUSINESS_THRESHOLD = thresholds.get('business_optimal', 0.59)
     STAT_THRESHOLD = thresholds.get('statistical_optimal', 0.509)
 
-    y_test = df_test['TARGET'].values
-    fraud_scores = df_test['predicted_pd'].values
+    y_test = df_test['TARGET']
 
     # Cost assumptions — aligned with NB03 §6.1 profit-maximization framework
-    AVG_LOAN = df_test['AMT_CREDIT'].median() if 'AMT_CREDIT' in df_test.columns else 500000
+    AVG_LOAN = float(np.median(df_test['AMT_CREDIT'])) if 'AMT_CREDIT' in df_test else 500000
     LGD = 0.60          # Loss Given Default (Basel IRB foundation, unsecured consumer; NB03 §6.1)
     PROFIT_RATE = 0.10  # Net interest margin after cost of funds (NB03 §6.1)
     FN_COST = AVG_LOAN * LGD           # Cost of approving a defaulter (FN)
     FP_COST = AVG_LOAN * PROFIT_RATE   # Lost profit from rejecting a good customer (FP)
     # FN_COST / FP_COST ratio = LGD / PROFIT_RATE = 0.60 / 0.10 = 6.0x
 
+    threshold_index = build_threshold_index(AVG_LOAN)
+
+    # Threshold-independent metrics (cached per store manifest + model version, shared across sessions)
+    MODEL_VERSION = model_card.get('model_metadata', {}).get('model_version', '') if model_card else ''
+    live_metrics = load_discrimination_metrics(json.dumps(df_test.manifest, sort_keys=True), MODEL_VERSION)
+
 except Exception as e:
     st.error(f"Failed to load model or data: {e}")
     st.info("Ensure model artifacts exist in models/ and test_dashboard.csv at project root.")
@@ -212,49 +326,11 @@ def render_footer():
 
 
 # =====================================================================
-# Sidebar - Global Configuration
+# Fragments (rerun independently of the rest of the page)
 # =====================================================================
-with st.sidebar:
-    st.title("CREW")
-    st.caption("Credit Risk Early Warning System")
-    st.markdown("---")
-
-    st.subheader("Global Filters")
-
-    risk_threshold = st.slider(
-        "Decision Threshold",
-        min_value=0.0,
-        max_value=1.0,
-        value=float(round(BUSINESS_THRESHOLD, 2)),
-        step=0.01,
-        help=(
-            f"Loans with PD above this threshold are flagged as high-risk. "
-            f"Business optimal: {BUSINESS_THRESHOLD:.3f} | "
-            f"Statistical optimal: {STAT_THRESHOLD:.3f}"
-        ),
-    )
-
-    st.markdown("---")
-
-    # Export
-    st.subheader("Export")
-    flagged_mask = fraud_scores >= risk_threshold
-    export_df = df_test[['SK_ID_CURR', 'TARGET', 'predicted_pd']].copy()
-    if 'AMT_CREDIT' in df_test.columns:
-        export_df['AMT_CREDIT'] = df_test['AMT_CREDIT']
-    export_df = export_df[flagged_mask]
-    csv_data = export_df.to_csv(index=False)
-    st.download_button(
-        label=f"Export Flagged ({flagged_mask.sum():,} loans)",
-        data=csv_data,
-        file_name="flagged_high_risk_loans.csv",
-        mime="text/csv",
-        help="Download all loans above the current threshold as CSV.",
-    )
-
-    st.markdown("---")
-
-    # Risk Calculator
+@st.fragment
+def render_risk_calculator(risk_threshold):
+    """Single-application calculator and batch scoring (fragment: reruns alone on its own inputs)."""
     st.subheader("Individual Risk Calculator")
     st.caption("Score a single loan application")
 
@@ -265,59 +341,18 @@ with st.sidebar:
 
     if st.button("Calculate Risk", type="primary"):
         try:
-            le_dict, cat_modes, pop_medians = load_risk_calculator_deps()
-
-            # Build feature vector from population medians
-            feat_vals = pop_medians.copy()
-
-            # Override with user inputs
-            feat_vals['EXT_SOURCE_3'] = calc_ext
-            feat_vals['EXT_SOURCE_2'] = calc_ext
-            feat_vals['EXT_SOURCE_1'] = calc_ext * 0.9
-            feat_vals['EXT_SOURCE_MEAN'] = calc_ext
-            feat_vals['EXT_SOURCE_WEIGHTED'] = calc_ext
-            feat_vals['EXT_SOURCE_MAX'] = calc_ext
-            feat_vals['EXT_SOURCE_MIN'] = calc_ext * 0.9
-            feat_vals['EXT_SOURCE_PRODUCT'] = calc_ext ** 3
-
-            feat_vals['DAYS_BIRTH'] = -calc_age * 365.25
-            feat_vals['AGE_YEARS'] = calc_age
-
-            feat_vals['AMT_CREDIT'] = calc_credit
-            feat_vals['AMT_GOODS_PRICE'] = calc_credit * 0.9
-
-            feat_vals['AMT_ANNUITY'] = calc_annuity
-            income = pop_medians.get('AMT_INCOME_TOTAL', 150000)
-            feat_vals['ANNUITY_TO_CREDIT'] = calc_annuity / calc_credit if calc_credit > 0 else 0
-            feat_vals['CREDIT_TO_GOODS'] = calc_credit / (calc_credit * 0.9) if calc_credit > 0 else 1
-            feat_vals['PAYMENT_BURDEN'] = (calc_annuity * 12) / income if income > 0 else 0
-            feat_vals['DEBT_TO_INCOME'] = calc_credit / income if income > 0 else 0
-
-            # Derived interaction features expected by the model
-            feat_vals['EXT_SCORE_x_PAYMENT_BURDEN'] = feat_vals['EXT_SOURCE_MEAN'] * feat_vals['PAYMENT_BURDEN']
-            feat_vals['EXT_SCORE_x_AGE'] = feat_vals['EXT_SOURCE_MEAN'] * calc_age
-            feat_vals['EXT_SCORE_x_DEBT_RATIO'] = feat_vals['EXT_SOURCE_MEAN'] * feat_vals['DEBT_TO_INCOME']
-            feat_vals['HAS_BUREAU_HISTORY'] = 1
-            feat_vals['HAS_PREV_APPLICATION'] = 1
-
-            # Encode categoricals with population modes
-            for col in cat_modes:
-                if col in le_dict:
-                    mode_val = cat_modes[col]
-                    if mode_val in le_dict[col].classes_:
-                        feat_vals[col] = le_dict[col].transform([mode_val])[0]
-                    else:
-                        feat_vals[col] = 0
-
-            # Build DataFrame for prediction, reindex so any gap features default to 0
-            X_calc = pd.DataFrame([feat_vals.reindex(feature_names, fill_value=0).values], columns=feature_names)
-            X_calc = X_calc.replace([np.inf, -np.inf], [10, -10]).fillna(0)
-            risk_score = model.predict_proba(X_calc)[:, 1][0]
+            scoring_template = load_scoring_template()
+            X_calc = scoring_template.application_vector(calc_ext, calc_age, calc_credit, calc_annuity)
+            model = load_model_async().result()
+            raw_score = scoring_template.predict(model.get_booster(), X_calc)
+            risk_score = float(load_calibration_table().apply(raw_score)[0])
 
+            # Band on the raw score: the threshold slider is on the raw scale, like the rest of the page
             st.markdown("### Risk Assessment")
-            if risk_score < 0.10:
+            risk_band = assign_risk_band(raw_score, risk_threshold)[0]
+            if risk_band == 'Low':
                 st.success(f"**Low Risk:** {risk_score:.1%}")
-            elif risk_score < risk_threshold:
+            elif risk_band == 'Moderate':
                 st.warning(f"**Moderate Risk:** {risk_score:.1%}")
             else:
                 st.error(f"**High Risk:** {risk_score:.1%}")
@@ -327,6 +362,7 @@ with st.sidebar:
 
             # Live SHAP attribution, B7
             try:
+                shap_explainer = load_shap_explainer_async().result()
                 sv = shap_explainer.shap_values(X_calc)
                 shap_vals = sv[0] if isinstance(sv, list) else sv.flatten()
                 shap_series = pd.Series(shap_vals, index=feature_names)
@@ -348,11 +384,146 @@ with st.sidebar:
         except Exception as e:
             st.error(f"Calculation error: {e}")
 
+    # Batch scoring: same derivation rules, one vectorized chunked pass per file
+    with st.expander("Batch Scoring (CSV / Parquet)"):
+        st.caption(
+            f"One row per application. Required columns: {', '.join(CALCULATOR_INPUTS)}. "
+            "Optional: SK_ID_CURR, AMT_INCOME_TOTAL and any model feature."
+        )
+        batch_file = st.file_uploader("Applications file", type=['csv', 'parquet'], key="batch_file")
+        batch_shap = st.checkbox("Include top SHAP risk drivers (slower)", value=False, key="batch_shap")
+
+        if batch_file is not None and st.button("Score File", key="batch_score"):
+            try:
+                applications = read_applications(batch_file, batch_file.name)
+                progress = st.progress(0.0, text="Scoring applications...")
+                st.session_state['batch_results'] = score_applications(
+                    applications, load_scoring_template(), load_model_async().result().get_booster(),
+                    risk_threshold=risk_threshold, lgd=LGD,
+                    explainer=load_shap_explainer_async().result() if batch_shap else None,
+                    chunk_size=5_000 if batch_shap else 50_000,
+                    progress_callback=lambda done, total: progress.progress(
+                        done / total, text=f"Scored {done:,} / {total:,}"),
+                    calibration=load_calibration_table(),
+                )
+                st.session_state['batch_results_name'] = Path(batch_file.name).stem
+            except Exception as e:
+                st.error(f"Batch scoring error: {e}")
+
+        batch_results = st.session_state.get('batch_results')
+        if batch_results is not None:
+            band_counts = batch_results['RISK_BAND'].value_counts()
+            st.markdown(
+                f"**{len(batch_results):,} scored** · mean PD {batch_results['PD'].mean():.1%} · "
+                f"High {band_counts.get('High', 0):,} · total ECL ${batch_results['ECL'].sum():,.0f}"
+            )
+            st.download_button(
+                label="Download Scores (CSV)",
+                data=batch_results.to_csv(index=False),
+                file_name=f"{st.session_state.get('batch_results_name', 'applications')}_scored.csv",
+                mime="text/csv",
+                key="batch_download",
+            )
+
+
+@st.fragment
+def render_case_study(cases):
+    """Case study selector and its SHAP waterfall (fragment: switching cases reruns only this block)."""
+    selected = st.selectbox("Select a case study:", list(cases.keys()))
+    case = cases[selected]
+
+    st.markdown("---")
+
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Default Probability", f"{case['score']:.4f}")
+    m2.metric("Model Decision", case['decision'])
+    m3.metric("Actual Outcome", case['actual'])
+
+    st.subheader("Borrower Features")
+    feat_items = list(case['features'].items())
+    mid = (len(feat_items) + 1) // 2
+    fc1, fc2 = st.columns(2)
+    with fc1:
+        for k, v in feat_items[:mid]:
+            st.markdown(f"**{k}:** {v}")
+    with fc2:
+        for k, v in feat_items[mid:]:
+            st.markdown(f"**{k}:** {v}")
+
+    st.subheader("SHAP Waterfall -- Why the Model Made This Decision")
+    wf_path = REPORTS_PATH / case['waterfall_file']
+    if wf_path.exists():
+        st.image(report_image(wf_path), caption=f"SHAP waterfall: {selected.split(' --')[0]}",
+                 use_container_width=True)
+    else:
+        st.info(f"Waterfall plot ({case['waterfall_file']}) not found. Run notebook 04.")
+
+    st.subheader("Model Decision Explanation")
+    st.write(case['explanation'])
+
+    st.subheader(case.get('drivers_title', 'Key Risk Drivers'))
+    for d in case['drivers']:
+        st.markdown(f"- {d}")
+
+    if 'improvement' in case:
+        st.subheader("Recommended Improvement")
+        st.write(case['improvement'])
+
+
+# =====================================================================
+# Sidebar - Global Configuration
+# =====================================================================
+with st.sidebar:
+    st.title("CREW")
+    st.caption("Credit Risk Early Warning System")
+    st.markdown("---")
+
+    st.subheader("Global Filters")
+
+    risk_threshold = st.slider(
+        "Decision Threshold",
+        min_value=0.0,
+        max_value=1.0,
+        value=float(round(BUSINESS_THRESHOLD, 2)),
+        step=0.01,
+        help=(
+            f"Loans with PD above this threshold are flagged as high-risk. "
+            f"Business optimal: {BUSINESS_THRESHOLD:.3f} | "
+            f"Statistical optimal: {STAT_THRESHOLD:.3f}"
+        ),
+    )
+    st.toggle(
+        "Full-resolution report images", value=False, key="full_res_images",
+        help="Report charts are shown as cached display-sized thumbnails; turn on to load the original PNGs.",
+    )
+
+    st.markdown("---")
+
+    # Export
+    st.subheader("Export")
+    n_flagged = threshold_index.flagged_count(risk_threshold)
+    export_fmt = st.selectbox(
+        "Format", list(EXPORT_FORMATS), key="export_fmt",
+        help="Compressed CSV or Parquet are much smaller for large flagged sets.",
+    )
+    export_ext, export_mime = EXPORT_FORMATS[export_fmt]
+    st.download_button(
+        label=f"Export Flagged ({n_flagged:,} loans)",
+        data=partial(build_flagged_export, risk_threshold, export_fmt),
+        file_name=f"flagged_high_risk_loans{export_ext}",
+        mime=export_mime,
+        on_click="ignore",
+        help="Download all loans above the current threshold. The file is generated when clicked.",
+    )
+
+    st.markdown("---")
+
+    render_risk_calculator(risk_threshold)
+
     st.markdown("---")
 
     with st.expander("Technical Architecture"):
         mc_perf = model_card.get('performance', {}) if model_card else {}
-        ks_sidebar = float(np.max(roc_curve(y_test, fraud_scores)[1] - roc_curve(y_test, fraud_scores)[0])) if 'y_test' in dir() else None
         st.markdown(
             "**Pipeline:** NB01 EDA → NB02 Feature Engineering → NB03 XGBoost Modeling → "
             "NB04 SHAP + LIME Explainability → NB05 AI Agent Surveillance\n\n"
@@ -367,30 +538,43 @@ with st.sidebar:
             "- **Agent:** Claude Sonnet 4 · 4-phase protocol · 5 custom tools · automated audit trail\n"
             "- **Compliance:** SR 11-7, Basel III/IV, IFRS 9, ECOA/Reg B, EU AI Act, FINMA 2017/1, FINMA 2023/1, Swiss nDSG"
         )
+        first_paint = startup_metrics.first_paint
+        explainer_ready = 'background: shap-explainer' in startup_metrics.phases
+        st.caption(
+            f"Cold start: imports {startup_metrics.import_seconds():.2f}s · "
+            f"first paint {f'{first_paint:.2f}s' if first_paint is not None else 'measuring...'} · "
+            f"SHAP explainer {'ready' if explainer_ready else 'warming up'}"
+        )
 
 
 # =====================================================================
 # Apply Threshold
 # =====================================================================
-y_pred = (fraud_scores >= risk_threshold).astype(int)
+# Confusion counts come from the sorted-score index: one searchsorted, no array scan
+confusion = threshold_index.confusion(risk_threshold)
+n_flagged = threshold_index.flagged_count(risk_threshold)
 
 
 # =====================================================================
 # MAIN TABS
 # =====================================================================
-tab1, tab2, tab3, tab4, tab5 = st.tabs([
+# Lazy tabs: only the open tab's render function runs on a rerun, so a slider
+# move costs the sidebar plus one tab no matter how many tabs exist.
+TAB_LABELS = [
     "Portfolio Overview",
     "Model Performance",
     "SHAP Explainability",
     "AI Agent Insights",
     "Regulatory Compliance",
-])
+]
+main_tabs = st.tabs(TAB_LABELS, key="main_tab", on_change="rerun")
 
 
 # =====================================================================
 # TAB 1 - Portfolio Overview
 # =====================================================================
-with tab1:
+def render_portfolio_overview():
+    """Tab 1: KPIs, IFRS 9 staging, PD distribution and cost analysis at the current threshold."""
     st.header("Portfolio Overview")
     st.caption("Key performance indicators and IFRS 9 staging for the credit portfolio")
 
@@ -398,27 +582,23 @@ with tab1:
     st.markdown(
         "CREW identifies borrowers at risk of default using 216 behavioral, financial, and "
         "credit bureau features engineered from 7 data sources. "
-        f"At the {BUSINESS_THRESHOLD:.0%} business threshold, it flags {y_pred.mean():.1%} of the portfolio "
+        f"At the {BUSINESS_THRESHOLD:.0%} business threshold, it flags {n_flagged / threshold_index.n:.1%} of the portfolio "
         "for review while potentially preventing hundreds of millions in credit losses. "
         "Built to SR 11-7, Basel III/IV, IFRS 9, EU AI Act, FINMA, and Swiss nDSG standards."
     )
 
     # Executive Brief expander, B4 + T7
-    exec_summary_path = REPORTS_PATH / 'executive_summary.txt'
-    if exec_summary_path.exists():
+    exec_summary = load_file_cache().load(REPORTS_PATH / 'executive_summary.txt', read_text)
+    if exec_summary is not None:
         with st.expander("Executive Brief. Key Findings & Credit Policy Recommendations"):
-            with open(exec_summary_path, encoding="utf-8") as f:
-                st.text(f.read())
+            st.text(exec_summary)
 
     st.markdown("---")
 
     # Confusion matrix components
-    tp = int(((y_test == 1) & (y_pred == 1)).sum())
-    fp = int(((y_test == 0) & (y_pred == 1)).sum())
-    fn = int(((y_test == 1) & (y_pred == 0)).sum())
-    tn = int(((y_test == 0) & (y_pred == 0)).sum())
-    total_defaults = int(y_test.sum())
-    total_loans = len(y_test)
+    tp, fp, fn, tn = confusion['tp'], confusion['fp'], confusion['fn'], confusion['tn']
+    total_defaults = threshold_index.total_defaults
+    total_loans = threshold_index.n
     recall = tp / total_defaults if total_defaults > 0 else 0
     precision_val = tp / (tp + fp) if (tp + fp) > 0 else 0
 
@@ -432,7 +612,7 @@ with tab1:
     # KPIs
     k1, k2, k3, k4 = st.columns(4)
     k1.metric("Total Loans (Test Set)", f"{total_loans:,}", f"{total_defaults:,} defaults ({y_test.mean():.1%})")
-    k2.metric("High-Risk Flagged", f"{y_pred.sum():,}", f"{y_pred.sum()/total_loans:.1%} of portfolio")
+    k2.metric("High-Risk Flagged", f"{n_flagged:,}", f"{n_flagged/total_loans:.1%} of portfolio")
     k3.metric("Defaults Detected", f"{tp:,} / {total_defaults:,}", f"{recall:.1%} recall")
     k4.metric("Expected Net Profit", f"${net_profit:,.0f}", f"+${net_profit - no_model_profit:,.0f} vs no-model")
 
@@ -446,31 +626,21 @@ with tab1:
         "Stage 3: Lifetime ECL (credit-impaired)."
     )
 
-    # Staging thresholds
-    stage1_mask = fraud_scores < 0.10
-    stage2_mask = (fraud_scores >= 0.10) & (fraud_scores < risk_threshold)
-    stage3_mask = fraud_scores >= risk_threshold
-
-    amt_col = 'AMT_CREDIT' if 'AMT_CREDIT' in df_test.columns else None
-
-    def compute_stage_ecl(mask, lifetime=False):
-        """Compute ECL for a stage."""
-        pds = fraud_scores[mask]
-        if amt_col:
-            eads = df_test[amt_col].values[mask]
-        else:
-            eads = np.full(mask.sum(), AVG_LOAN)
+    def compute_stage_ecl(lower, upper, lifetime=False):
+        """Compute ECL for the PD band [lower, upper) from the threshold index prefix sums."""
+        count, exposure, pd_x_ead = threshold_index.band_totals(lower, upper)
         if lifetime:
             # Lifetime ECL ~ PD * LGD * EAD (simplified: multiply by maturity factor ~3)
-            ecl = (pds * LGD * eads * 3).sum()
+            ecl = pd_x_ead * LGD * 3
         else:
             # 12-month ECL
-            ecl = (pds * LGD * eads).sum()
-        return len(pds), eads.sum(), ecl
+            ecl = pd_x_ead * LGD
+        return count, exposure, ecl
 
-    s1_count, s1_exposure, s1_ecl = compute_stage_ecl(stage1_mask, lifetime=False)
-    s2_count, s2_exposure, s2_ecl = compute_stage_ecl(stage2_mask, lifetime=True)
-    s3_count, s3_exposure, s3_ecl = compute_stage_ecl(stage3_mask, lifetime=True)
+    # Staging thresholds: Stage 1 PD < 10%, Stage 2 10% <= PD < threshold, Stage 3 PD >= threshold
+    s1_count, s1_exposure, s1_ecl = compute_stage_ecl(None, 0.10, lifetime=False)
+    s2_count, s2_exposure, s2_ecl = compute_stage_ecl(0.10, risk_threshold, lifetime=True)
+    s3_count, s3_exposure, s3_ecl = compute_stage_ecl(risk_threshold, None, lifetime=True)
     total_ecl = s1_ecl + s2_ecl + s3_ecl
     total_exposure = s1_exposure + s2_exposure + s3_exposure
 
@@ -562,13 +732,14 @@ with tab1:
     left, right = st.columns(2)
     with left:
         st.subheader("PD Score Distribution")
+        pd_hist = load_score_histograms()
         fig_hist = go.Figure()
-        fig_hist.add_trace(go.Histogram(
-            x=fraud_scores[y_test == 0], nbinsx=50, name='Non-Default',
+        fig_hist.add_trace(go.Bar(
+            x=pd_hist['centers'], y=pd_hist['non_default'], width=pd_hist['width'], name='Non-Default',
             marker_color='#2196F3', opacity=0.6,
         ))
-        fig_hist.add_trace(go.Histogram(
-            x=fraud_scores[y_test == 1], nbinsx=50, name='Default',
+        fig_hist.add_trace(go.Bar(
+            x=pd_hist['centers'], y=pd_hist['default'], width=pd_hist['width'], name='Default',
             marker_color='#f44336', opacity=0.6,
         ))
         fig_hist.add_vline(x=risk_threshold, line_dash='dash', line_color='#333',
@@ -606,14 +777,15 @@ with tab1:
 # =====================================================================
 # TAB 2 - Model Performance
 # =====================================================================
-with tab2:
+def render_model_performance():
+    """Tab 2: confusion matrix, ROC, discrimination metrics, cost-benefit and decile tables."""
     st.header("Model Performance")
     st.caption("XGBoost model evaluation on the held-out test set (61,503 loans)")
 
     # Live Confusion Matrix + ROC
     st.subheader("Performance at Current Threshold")
-    cm = confusion_matrix(y_test, y_pred)
-    tn_v, fp_v, fn_v, tp_v = cm.ravel()
+    tn_v, fp_v, fn_v, tp_v = confusion['tn'], confusion['fp'], confusion['fn'], confusion['tp']
+    cm = np.array([[tn_v, fp_v], [fn_v, tp_v]])
 
     cm_left, cm_right = st.columns(2)
 
@@ -639,8 +811,8 @@ with tab2:
 
     with cm_right:
         # Live ROC curve
-        fpr_arr, tpr_arr, _ = roc_curve(y_test, fraud_scores)
-        roc_auc_val = roc_auc_score(y_test, fraud_scores)
+        fpr_arr, tpr_arr = live_metrics['roc']['fpr'], live_metrics['roc']['tpr']
+        roc_auc_val = live_metrics['auc_roc']
         tpr_op = tp_v / (tp_v + fn_v) if (tp_v + fn_v) > 0 else 0
         fpr_op = fp_v / (fp_v + tn_v) if (fp_v + tn_v) > 0 else 0
 
@@ -666,19 +838,17 @@ with tab2:
         st.plotly_chart(fig_roc, use_container_width=True)
 
     # Key discrimination metrics row (AUC, Gini, KS)
-    ks_stat = float(np.max(tpr_arr - fpr_arr))
-    gini = 2 * roc_auc_val - 1
+    ks_stat = live_metrics['ks']
+    gini = live_metrics['gini']
     km1, km2, km3, km4 = st.columns(4)
     km1.metric("AUC-ROC", f"{roc_auc_val:.4f}", help="Area Under the ROC Curve")
     km2.metric("Gini Coefficient", f"{gini:.4f}",
                help="Gini = 2×AUC − 1. Primary discrimination metric in EU/UK banking.")
     km3.metric("KS Statistic", f"{ks_stat:.4f}",
                help="Kolmogorov-Smirnov = max(TPR − FPR). Standard US bank model validation metric (OCC, SR 11-7).")
-    if model_card:
-        brier = model_card.get('performance', {}).get('brier_score', None)
-        if brier:
-            km4.metric("Brier Score", f"{brier:.4f}",
-                       help="Measures calibration accuracy. Lower is better. 0 = perfect, 0.25 = no skill.")
+    brier = (model_card or {}).get('performance', {}).get('brier_score') or live_metrics['brier_score']
+    km4.metric("Brier Score", f"{brier:.4f}",
+               help="Measures calibration accuracy. Lower is better. 0 = perfect, 0.25 = no skill.")
 
     st.markdown("---")
 
@@ -688,26 +858,26 @@ with tab2:
     with img_l:
         roc_img = REPORTS_PATH / 'precision_recall_curve.png'
         if roc_img.exists():
-            st.image(Image.open(roc_img), caption='Precision-Recall Curve', use_container_width=True)
+            st.image(report_image(roc_img), caption='Precision-Recall Curve', use_container_width=True)
     with img_r:
         cost_img = REPORTS_PATH / 'profit_vs_threshold.png'
         if cost_img.exists():
-            st.image(Image.open(cost_img), caption='Profit vs Threshold', use_container_width=True)
+            st.image(report_image(cost_img), caption='Profit vs Threshold', use_container_width=True)
 
     img_l2, img_r2 = st.columns(2)
     with img_l2:
         cal_img = REPORTS_PATH / 'calibration_curve.png'
         if cal_img.exists():
-            st.image(Image.open(cal_img), caption='Calibration Curve', use_container_width=True)
+            st.image(report_image(cal_img), caption='Calibration Curve', use_container_width=True)
     with img_r2:
         thresh_img = REPORTS_PATH / 'threshold_analysis.png'
         if thresh_img.exists():
-            st.image(Image.open(thresh_img), caption='Threshold Analysis', use_container_width=True)
+            st.image(report_image(thresh_img), caption='Threshold Analysis', use_container_width=True)
 
     cal_ba_img = REPORTS_PATH / 'calibration_before_after.png'
     if cal_ba_img.exists():
         st.image(
-            Image.open(cal_ba_img),
+            report_image(cal_ba_img),
             caption=(
                 'Calibration Before vs. After, Isotonic Regression applied post-hoc '
                 'to restore true PD scale, as required for Basel III IRB and IFRS 9 ECL provisioning.'
@@ -721,11 +891,11 @@ with tab2:
     st.subheader("Feature Importance (SHAP)")
     shap_imp = REPORTS_PATH / 'shap_global_importance.png'
     if shap_imp.exists():
-        st.image(Image.open(shap_imp), use_container_width=True)
+        st.image(report_image(shap_imp), use_container_width=True)
     else:
         fi_img = REPORTS_PATH / 'feature_importance.png'
         if fi_img.exists():
-            st.image(Image.open(fi_img), use_container_width=True)
+            st.image(report_image(fi_img), use_container_width=True)
 
     st.markdown("---")
 
@@ -737,14 +907,13 @@ with tab2:
         round(float(BUSINESS_THRESHOLD), 2),
         0.70, 0.80, 0.90,
     ]))
+    # All sweep thresholds resolved in one vectorized searchsorted
+    sweep = threshold_index.confusion(np.array(thresholds_sweep))
     rows = []
-    for t in thresholds_sweep:
-        yp = (fraud_scores >= t).astype(int)
-        t_tp = int(((y_test == 1) & (yp == 1)).sum())
-        t_fp = int(((y_test == 0) & (yp == 1)).sum())
-        t_fn = int(((y_test == 1) & (yp == 0)).sum())
-        t_tn = int(((y_test == 0) & (yp == 0)).sum())
-        t_rec = t_tp / total_defaults if total_defaults > 0 else 0
+    for i, t in enumerate(thresholds_sweep):
+        t_tp, t_fp = int(sweep['tp'][i]), int(sweep['fp'][i])
+        t_fn, t_tn = int(sweep['fn'][i]), int(sweep['tn'][i])
+        t_rec = t_tp / (t_tp + t_fn) if (t_tp + t_fn) > 0 else 0
         t_pre = t_tp / (t_tp + t_fp) if (t_tp + t_fp) > 0 else 0
         t_net_profit = t_tn * FP_COST - t_fn * FN_COST - t_fp * FP_COST
         marker = " *" if abs(t - risk_threshold) < 0.005 else ""
@@ -771,6 +940,9 @@ with tab2:
     )
     if model_card and 'calibration' in model_card:
         decile_rows = model_card['calibration'].get('decile_table', [])
+        if not decile_rows:
+            # Rebuild from the threshold index (deciles numbered from lowest PD, as in NB03)
+            decile_rows = threshold_index.decile_table()
         if decile_rows:
             decile_df = pd.DataFrame(decile_rows)
             decile_df['Decile'] = decile_df['decile']
@@ -801,7 +973,8 @@ with tab2:
 # =====================================================================
 # TAB 3 - SHAP Explainability
 # =====================================================================
-with tab3:
+def render_shap_explainability():
+    """Tab 3: global SHAP importance, case studies and LIME validation."""
     st.header("SHAP Explainability")
     st.caption(
         "Model explanations using SHAP TreeExplainer. "
@@ -815,12 +988,12 @@ with tab3:
     with g1:
         shap_bar = REPORTS_PATH / 'shap_global_importance.png'
         if shap_bar.exists():
-            st.image(Image.open(shap_bar), caption='Mean |SHAP| Feature Importance',
+            st.image(report_image(shap_bar), caption='Mean |SHAP| Feature Importance',
                      use_container_width=True)
     with g2:
         shap_bee = REPORTS_PATH / 'shap_summary_beeswarm.png'
         if shap_bee.exists():
-            st.image(Image.open(shap_bee), caption='SHAP Summary (Beeswarm)',
+            st.image(report_image(shap_bee), caption='SHAP Summary (Beeswarm)',
                      use_container_width=True)
 
     st.markdown("---")
@@ -841,7 +1014,7 @@ with tab3:
         fpath = REPORTS_PATH / fname
         if fpath.exists():
             with dep_cols[i % 3]:
-                st.image(Image.open(fpath), caption=label, use_container_width=True)
+                st.image(report_image(fpath), caption=label, use_container_width=True)
 
     st.markdown("---")
 
@@ -945,45 +1118,7 @@ with tab3:
         },
     }
 
-    selected = st.selectbox("Select a case study:", list(cases.keys()))
-    case = cases[selected]
-
-    st.markdown("---")
-
-    m1, m2, m3 = st.columns(3)
-    m1.metric("Default Probability", f"{case['score']:.4f}")
-    m2.metric("Model Decision", case['decision'])
-    m3.metric("Actual Outcome", case['actual'])
-
-    st.subheader("Borrower Features")
-    feat_items = list(case['features'].items())
-    mid = (len(feat_items) + 1) // 2
-    fc1, fc2 = st.columns(2)
-    with fc1:
-        for k, v in feat_items[:mid]:
-            st.markdown(f"**{k}:** {v}")
-    with fc2:
-        for k, v in feat_items[mid:]:
-            st.markdown(f"**{k}:** {v}")
-
-    st.subheader("SHAP Waterfall -- Why the Model Made This Decision")
-    wf_path = REPORTS_PATH / case['waterfall_file']
-    if wf_path.exists():
-        st.image(Image.open(wf_path), caption=f"SHAP waterfall: {selected.split(' --')[0]}",
-                 use_container_width=True)
-    else:
-        st.info(f"Waterfall plot ({case['waterfall_file']}) not found. Run notebook 04.")
-
-    st.subheader("Model Decision Explanation")
-    st.write(case['explanation'])
-
-    st.subheader(case.get('drivers_title', 'Key Risk Drivers'))
-    for d in case['drivers']:
-        st.markdown(f"- {d}")
-
-    if 'improvement' in case:
-        st.subheader("Recommended Improvement")
-        st.write(case['improvement'])
+    render_case_study(cases)
 
     st.markdown("---")
 
@@ -1006,7 +1141,7 @@ with tab3:
         fpath = REPORTS_PATH / fname
         if fpath.exists():
             with lime_cols[i]:
-                st.image(Image.open(fpath), caption=label, use_container_width=True)
+                st.image(report_image(fpath), caption=label, use_container_width=True)
             lime_found = True
 
     if not lime_found:
@@ -1021,7 +1156,7 @@ with tab3:
             "Divergence highlights features that behave differently under "
             "global tree-based vs. local linear approximations."
         )
-        st.image(Image.open(comparison_img), use_container_width=True)
+        st.image(report_image(comparison_img), use_container_width=True)
 
     render_footer()
 
@@ -1029,7 +1164,8 @@ with tab3:
 # =====================================================================
 # TAB 4 - AI Agent Insights
 # =====================================================================
-with tab4:
+def render_agent_insights():
+    """Tab 4: latest agent surveillance output and audit trail."""
     st.header("AI Agent Portfolio Surveillance")
     st.caption(
         "Autonomous AI agent (Claude Sonnet 4) performs a 4-phase hierarchical analysis "
@@ -1203,7 +1339,8 @@ with tab4:
 # =====================================================================
 # TAB 5 - Regulatory Compliance
 # =====================================================================
-with tab5:
+def render_regulatory_compliance():
+    """Tab 5: regulatory compliance mapping (static content)."""
     st.header("Regulatory Compliance", anchor="compliance-top")
     st.caption("Model governance, fair lending review, IFRS 9 methodology, and audit readiness")
 
@@ -1256,21 +1393,24 @@ with tab5:
 
     # Audit trail download, B5
     audit_path = BASE_PATH / 'audit_trail.log'
-    if audit_path.exists():
-        with open(audit_path, 'rb') as f:
-            audit_bytes = f.read()
+    audit_signature = file_signature(audit_path)
+    if audit_signature is not None:
+        audit_size = audit_signature[1]
+        # Read only on click, in chunks; large logs are gzip-compressed on the fly
+        audit_gzip = audit_size > AUDIT_GZIP_BYTES
         dl1, dl2 = st.columns([1, 3])
         with dl1:
             st.download_button(
                 label="Download Audit Trail",
-                data=audit_bytes,
-                file_name="audit_trail.log",
-                mime="text/plain",
+                data=partial(read_file_chunked, audit_path, audit_gzip),
+                file_name="audit_trail.log.gz" if audit_gzip else "audit_trail.log",
+                mime="application/gzip" if audit_gzip else "text/plain",
+                on_click="ignore",
                 help="Full audit log of model development, agent runs, and compliance checks.",
             )
         with dl2:
             st.caption(
-                f"Audit trail: {len(audit_bytes)/1024:.0f} KB, "
+                f"Audit trail: {audit_size/1024:.0f} KB, "
                 "logs all model decisions, agent runs, and regulatory compliance events. "
                 "Retention requirement: 7 years (US regulatory standard)."
             )
@@ -1624,3 +1764,24 @@ per Art. 22 nDSG and obtain legal review of the processing legal basis under Art
     st.markdown("[Back to top](#compliance-top)")
 
     render_footer()
+
+
+# =====================================================================
+# Render the open tab
+# =====================================================================
+TAB_RENDERERS = [
+    render_portfolio_overview,
+    render_model_performance,
+    render_shap_explainability,
+    render_agent_insights,
+    render_regulatory_compliance,
+]
+for tab, render_tab in zip(main_tabs, TAB_RENDERERS):
+    if tab.open:
+        with tab:
+            render_tab()
+
+# First paint is done: record it, then load the model and build the SHAP explainer
+# off the critical path (cached per process, so the threads start only once)
+startup_metrics.mark_first_paint()
+load_shap_explainer_async()
@@ -0,0 +1,259 @@
+"""
+Vectorized application scoring for the Individual Risk Calculator.
+
+The calculator fields map to base model inputs here (EXT_SOURCE fan-out,
+DAYS_BIRTH, amounts); PAYMENT_BURDEN, DEBT_TO_INCOME, the EXT_SCORE_x_*
+interactions etc. are recomputed from them with the NB02 definitions in
+``src/feature_graph.py``. Everything operates on whole columns, so the
+single-application calculator and batch file uploads build identical feature
+vectors, and both match training. ``ScoringTemplate`` precompiles everything
+that does not depend on the request (medians, encoded categorical modes,
+column positions) so a single application is one array copy, a handful of
+slot writes and one ``Booster.inplace_predict`` call.
+
+Input columns (one row per application):
+    EXT_SOURCE, AGE_YEARS, AMT_CREDIT, AMT_ANNUITY   required (calculator inputs)
+    AMT_INCOME_TOTAL                                 optional, defaults to the population median
+    SK_ID_CURR                                       optional, carried through to the output
+    any other model feature                          optional, used as-is (categoricals as raw labels)
+"""
+
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from .categorical_encoding import ENCODERS_FILE, CategoricalEncoder, load_current_encoder
+from .feature_graph import APPLICATION_GRAPH
+
+CALCULATOR_INPUTS = ['EXT_SOURCE', 'AGE_YEARS', 'AMT_CREDIT', 'AMT_ANNUITY']
+ID_COLUMN = 'SK_ID_CURR'
+DEFAULT_INCOME = 150000
+LOW_RISK_PD = 0.10
+
+
+def calculator_overrides(ext, age, credit, annuity, income) -> dict:
+    """
+    Base model inputs implied by the calculator fields (arrays or scalars).
+
+    One external score stands in for all three bureaus (EXT_SOURCE_1 at 90%),
+    goods price is 90% of the credit and ``annuity`` is the monthly payment
+    (``AMT_ANNUITY``, as in application_train). Every derived feature follows
+    from these through the feature graph.
+    """
+    ext = np.asarray(ext, dtype=np.float64)
+    credit = np.asarray(credit, dtype=np.float64)
+    ones = np.ones_like(ext)
+    return {
+        'EXT_SOURCE_1': ext * 0.9,
+        'EXT_SOURCE_2': ext,
+        'EXT_SOURCE_3': ext,
+        'DAYS_BIRTH': -np.asarray(age, dtype=np.float64) * 365.25,
+        'AMT_CREDIT': credit,
+        'AMT_GOODS_PRICE': credit * 0.9,
+        'AMT_ANNUITY': np.asarray(annuity, dtype=np.float64),
+        'AMT_INCOME_TOTAL': np.broadcast_to(np.asarray(income, dtype=np.float64), ext.shape),
+        'HAS_BUREAU_HISTORY': ones,
+        'HAS_PREV_APPLICATION': ones,
+    }
+
+
+def derive_calculator_features(ext, age, credit, annuity, income, context) -> dict:
+    """
+    Calculator feature overrides for arrays of inputs.
+
+    ``context`` supplies the other inputs of the affected features (population
+    medians, or the supplied columns of a batch). Returns
+    ``{feature_name: np.ndarray}`` for the overridden inputs and every feature
+    derived from them; every array has the length of the inputs.
+    """
+    return APPLICATION_GRAPH.recompute(context, calculator_overrides(ext, age, credit, annuity, income))
+
+
+def _clean(X: np.ndarray) -> np.ndarray:
+    """Calculator gap handling: +/-inf -> +/-10, NaN -> 0 (in place)."""
+    X[np.isposinf(X)] = 10.0
+    X[np.isneginf(X)] = -10.0
+    X[np.isnan(X)] = 0.0
+    return X
+
+
+class ScoringTemplate:
+    """
+    Precompiled feature vector for the calculator, built once per model.
+
+    Holds a float32 base vector (population medians with categorical modes
+    already label-encoded and gaps cleaned), a name -> column index map and
+    the training ``CategoricalEncoder``. A request only patches the
+    calculator-derived slots of a copy of the base vector, which then goes
+    straight to ``Booster.inplace_predict``.
+    """
+
+    def __init__(self, feature_names: list, medians: pd.Series, encoder: CategoricalEncoder, cat_modes: dict):
+        self.feature_names = list(feature_names)
+        self.index = {name: i for i, name in enumerate(self.feature_names)}
+        self.income = float(medians.get('AMT_INCOME_TOTAL', DEFAULT_INCOME))
+
+        self.encoder = encoder
+        self.mode_codes = {}
+        for col in cat_modes:
+            if col in encoder and col in self.index:
+                code = encoder.encode_value(col, cat_modes[col])
+                self.mode_codes[col] = 0 if np.isnan(code) else code
+
+        base = np.array(medians.reindex(self.feature_names), dtype=np.float64)
+        for col, code in self.mode_codes.items():
+            base[self.index[col]] = code
+        self.base = _clean(base).astype(np.float32)
+        # Population values of the graph inputs the calculator does not set (CNT_FAM_MEMBERS, ...),
+        # read from the float32 base as the batch path does
+        self._context = {name: np.float64(self.base[self.index[name]]) if name in self.index else np.nan
+                         for name in [*APPLICATION_GRAPH.inputs, *APPLICATION_GRAPH.features]}
+
+        overridden = list(calculator_overrides(0, 0, 0, 0, 1))
+        self._calculator_set = set(overridden) | APPLICATION_GRAPH.descendants(overridden)
+        self._derived_names = sorted((n for n in self._calculator_set if n in self.index), key=self.index.get)
+        self._derived_idx = np.array([self.index[n] for n in self._derived_names], dtype=np.intp)
+
+    @classmethod
+    def from_artifacts(cls, models_dir):
+        """Build the template from ``feature_names.pkl``, ``population_medians.csv`` and the encoders in ``models_dir``."""
+        models_dir = Path(models_dir)
+        return cls(joblib.load(models_dir / 'feature_names.pkl'),
+                   pd.read_csv(models_dir / 'population_medians.csv', index_col=0).squeeze(),
+                   load_current_encoder(models_dir / ENCODERS_FILE.name),
+                   joblib.load(models_dir / 'categorical_modes.pkl'))
+
+    def application_vector(self, ext: float, age: float, credit: float, annuity: float,
+                           income: float = None) -> np.ndarray:
+        """(1, n_features) float32 vector for one application, patching only the derived slots."""
+        derived = derive_calculator_features(ext, age, credit, annuity,
+                                             self.income if income is None else income, self._context)
+        values = np.array([derived[n] for n in self._derived_names], dtype=np.float64)
+        x = self.base.copy()
+        x[self._derived_idx] = _clean(values)
+        return x[np.newaxis, :]
+
+    def feature_matrix(self, applications: pd.DataFrame) -> np.ndarray:
+        """
+        (n, n_features) float32 matrix for a batch of applications.
+
+        Same rules as the calculator: template base -> supplied feature columns
+        -> calculator-derived overrides, with supplied categoricals encoded from
+        raw labels (unseen labels fall back to the population mode). Features
+        derived from a supplied input (e.g. EMPLOYMENT_YEARS from DAYS_EMPLOYED)
+        are recomputed from it.
+        """
+        missing = [c for c in CALCULATOR_INPUTS if c not in applications.columns]
+        if missing:
+            raise ValueError(f"Missing required input columns: {', '.join(missing)}")
+
+        X = np.repeat(self.base.astype(np.float64)[np.newaxis, :], len(applications), axis=0)
+
+        # Features supplied directly in the file
+        for col in applications.columns:
+            if col not in self.index or col in CALCULATOR_INPUTS:
+                continue
+            if col in self.mode_codes:
+                codes = self.encoder.encode(col, applications[col])
+                X[:, self.index[col]] = np.where(np.isnan(codes), self.mode_codes[col], codes)
+            else:
+                X[:, self.index[col]] = pd.to_numeric(applications[col], errors='coerce').to_numpy()
+
+        income = (applications['AMT_INCOME_TOTAL'].to_numpy(dtype=np.float64)
+                  if 'AMT_INCOME_TOTAL' in applications.columns else self.income)
+        overrides = calculator_overrides(
+            applications['EXT_SOURCE'].to_numpy(), applications['AGE_YEARS'].to_numpy(),
+            applications['AMT_CREDIT'].to_numpy(), applications['AMT_ANNUITY'].to_numpy(), income,
+        )
+        # Supplied graph inputs/features the calculator does not set are overrides too
+        for col in applications.columns:
+            if col in self.index and col in APPLICATION_GRAPH and col not in self._calculator_set:
+                overrides[col] = X[:, self.index[col]].copy()
+        context = {name: X[:, self.index[name]] if name in self.index else value
+                   for name, value in self._context.items()}
+        derived = APPLICATION_GRAPH.recompute(context, overrides)
+        for name, values in derived.items():
+            if name in self.index:
+                X[:, self.index[name]] = values
+
+        return _clean(X).astype(np.float32)
+
+    @staticmethod
+    def predict(booster, X: np.ndarray, calibration=None) -> np.ndarray:
+        """
+        Default probabilities straight from the booster (no DataFrame / sklearn
+        wrapper), mapped through ``calibration`` (a ``CalibrationTable``) when given.
+        """
+        raw = booster.inplace_predict(X)
+        return raw if calibration is None else calibration.apply(raw)
+
+
+def assign_risk_band(raw_scores: np.ndarray, risk_threshold: float) -> np.ndarray:
+    """
+    Calculator bands: Low below 10%, Moderate below the decision threshold,
+    otherwise High. Both cut-offs are on the raw booster scale (the scale
+    ``thresholds.pkl`` was optimised on and the dashboard stages use), so bands
+    take raw scores, not calibrated PDs.
+    """
+    return np.select(
+        [raw_scores < LOW_RISK_PD, raw_scores < risk_threshold],
+        ['Low', 'Moderate'],
+        default='High',
+    )
+
+
+def top_shap_reasons(explainer, X: np.ndarray, feature_names: list, k: int = 3) -> np.ndarray:
+    """Names of the ``k`` features pushing each row's PD up the most (n_rows x k array)."""
+    sv = explainer.shap_values(X)
+    sv = np.asarray(sv[1] if isinstance(sv, list) else sv)
+    top = np.argsort(-sv, axis=1)[:, :k]
+    return np.asarray(feature_names)[top]
+
+
+def score_applications(applications: pd.DataFrame, template: ScoringTemplate, booster,
+                       risk_threshold: float, lgd: float, explainer=None, n_reasons: int = 3, chunk_size: int = 50_000,
+                       progress_callback=None, calibration=None) -> pd.DataFrame:
+    """
+    Score a batch of applications in chunks.
+
+    Returns one row per application with PD (calibrated when a ``calibration``
+    table is given), RISK_BAND (from the raw score, see ``assign_risk_band``),
+    ECL (AMT_CREDIT x PD x LGD) and, when an
+    ``explainer`` is given, the top SHAP risk drivers.
+    ``progress_callback(done, total)`` is called after every chunk.
+    """
+    total = len(applications)
+    parts = []
+    for start in range(0, total, chunk_size):
+        chunk = applications.iloc[start:start + chunk_size]
+        X = template.feature_matrix(chunk)
+        raw_scores = template.predict(booster, X)
+        pd_scores = raw_scores if calibration is None else calibration.apply(raw_scores)
+
+        out = pd.DataFrame(index=chunk.index)
+        if ID_COLUMN in chunk.columns:
+            out[ID_COLUMN] = chunk[ID_COLUMN].to_numpy()
+        out['PD'] = pd_scores
+        out['RISK_BAND'] = assign_risk_band(raw_scores, risk_threshold)
+        out['ECL'] = chunk['AMT_CREDIT'].to_numpy(dtype=np.float64) * pd_scores * lgd
+        if explainer is not None:
+            reasons = top_shap_reasons(explainer, X, template.feature_names, n_reasons)
+            for i in range(reasons.shape[1]):
+                out[f'RISK_DRIVER_{i + 1}'] = reasons[:, i]
+        parts.append(out)
+
+        if progress_callback is not None:
+            progress_callback(min(start + chunk_size, total), total)
+
+    if not parts:
+        return pd.DataFrame(columns=['PD', 'RISK_BAND', 'ECL'])
+    return pd.concat(parts, ignore_index=True)
+
+
+def read_applications(uploaded_file, name: str) -> pd.DataFrame:
+    """Read an uploaded CSV or Parquet file of applications."""
+    if name.lower().endswith('.parquet'):
+        return pd.read_parquet(uploaded_file)
+    return pd.read_csv(uploaded_file)
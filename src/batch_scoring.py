@@ -0,0 +1,422 @@
+"""
+Streaming batch scorer for portfolio-scale PD runs.
+
+Input is read in fixed-size row chunks from CSV (optionally gzipped), Parquet, a
+SQLite table or a feature store directory (``src/feature_store.py``). Each chunk
+becomes a float32 matrix in the model's feature order, is scored with
+``Booster.inplace_predict`` (no DataFrame / sklearn wrapper) and mapped raw ->
+calibrated PD through the compiled calibration table
+(``models/calibration_table.json``, see ``src/calibration.py``). Results are
+appended to the output (CSV or Parquet) as each chunk completes, so memory is
+bounded by ``chunk_rows`` x the number of chunks in flight, never by the size of
+the portfolio.
+
+With ``workers > 1`` chunks fan out over a process pool; every worker loads the
+model artifacts once, pins XGBoost to one thread, and results are written back
+in input order. From a feature store, workers are sent row ranges rather than
+DataFrames and read their rows from the shared memory-mapped columns.
+
+Usage:
+    python -m src.batch_scoring data/processed/features_train.csv reports/pd_scores.parquet
+    python -m src.batch_scoring data/credit_risk.db scores.csv --table engineered_features --workers 4
+    python -m src.batch_scoring data/processed/feature_store scores.parquet --workers 4
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+import warnings
+from collections import deque
+from functools import lru_cache
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from .calibration import CalibrationTable, load_current_table
+from .categorical_encoding import ENCODERS_FILE, CategoricalEncoder, load_current_encoder
+from .feature_alignment import alignment_plan
+from .feature_store import FeatureStore, is_feature_store
+from .score_cache import ScoreCache, artifact_versions, row_hashes
+
+MODELS_PATH = Path(__file__).resolve().parent.parent / 'models'
+ID_COLUMN = 'SK_ID_CURR'
+CHUNK_ROWS = 100_000
+SQLITE_SUFFIXES = {'.db', '.sqlite', '.sqlite3'}
+
+
+# =============================================================================
+# Chunked readers
+# =============================================================================
+
+def _source_kind(path: Path) -> str:
+    if path.is_dir() and is_feature_store(path):
+        return 'store'
+    suffixes = [s.lower() for s in path.suffixes]
+    if suffixes and suffixes[-1] == '.parquet':
+        return 'parquet'
+    if suffixes and suffixes[-1] in SQLITE_SUFFIXES:
+        return 'sqlite'
+    if '.csv' in suffixes:
+        return 'csv'
+    raise ValueError(f"Unsupported input '{path.name}'; expected .csv[.gz], .parquet, "
+                     "a SQLite database or a feature store directory")
+
+
+def iter_chunks(source, columns=None, chunk_rows: int = CHUNK_ROWS, table: str = None):
+    """
+    Yield DataFrames of at most ``chunk_rows`` rows from a CSV, Parquet or SQLite source.
+
+    Only ``columns`` that exist in the source are read (all columns when ``None``);
+    ``table`` is required for SQLite.
+    """
+    path = Path(source)
+    kind = _source_kind(path)
+    wanted = None if columns is None else set(columns)
+
+    if kind == 'store':
+        raise ValueError("Feature stores are read by row range; use FeatureStore.row_ranges()")
+
+    if kind == 'csv':
+        usecols = None if wanted is None else (lambda c: c in wanted)
+        yield from pd.read_csv(path, usecols=usecols, chunksize=chunk_rows, low_memory=False)
+
+    elif kind == 'parquet':
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(path)
+        names = parquet.schema_arrow.names
+        selected = names if wanted is None else [c for c in names if c in wanted]
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=selected):
+            yield batch.to_pandas()
+
+    else:
+        if not table:
+            raise ValueError("A table name is required to read from SQLite")
+        with sqlite3.connect(f'file:{path}?mode=ro', uri=True) as conn:
+            names = [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+            if not names:
+                raise ValueError(f"Table '{table}' not found in {path.name}")
+            selected = names if wanted is None else [c for c in names if c in wanted]
+            select = ', '.join(f'"{c}"' for c in selected)
+            yield from pd.read_sql_query(f'SELECT {select} FROM "{table}"', conn, chunksize=chunk_rows)
+
+
+# =============================================================================
+# Scoring
+# =============================================================================
+
+class BatchScorer:
+    """
+    Raw model inputs -> calibrated PD for one chunk at a time.
+
+    Feature handling mirrors NB03 training: categoricals get their training
+    codes from the compiled ``CategoricalEncoder``, numeric gaps stay NaN
+    (XGBoost's native missing-value branch). Feature columns absent from the input and
+    category labels unseen at training time are treated as missing as well.
+    """
+
+    def __init__(self, booster, feature_names: list, encoder: CategoricalEncoder,
+                 calibration: CalibrationTable = None):
+        self.booster = booster
+        self.feature_names = list(feature_names)
+        self.encoder = encoder
+        self.calibration = calibration
+
+    @classmethod
+    def from_artifacts(cls, models_dir=MODELS_PATH, nthread: int = None):
+        """Load model, feature list, encoders and calibration table from ``models_dir``."""
+        models_dir = Path(models_dir)
+        with warnings.catch_warnings():
+            # Pickled XGBClassifier from an older xgboost release
+            warnings.simplefilter('ignore')
+            booster = joblib.load(models_dir / 'xgb_credit_model.pkl').get_booster()
+        if nthread is not None:
+            booster.set_param({'nthread': nthread})
+        return cls(booster,
+                   joblib.load(models_dir / 'feature_names.pkl'),
+                   load_current_encoder(models_dir / ENCODERS_FILE.name),
+                   load_current_table(models_dir))
+
+    def feature_matrix(self, chunk: pd.DataFrame) -> np.ndarray:
+        """(n, n_features) float32 matrix in model feature order (plan compiled once per chunk schema)."""
+        return alignment_plan(chunk, self.feature_names, self.encoder).transform(chunk)
+
+    def predict_raw(self, X: np.ndarray) -> np.ndarray:
+        return self.booster.inplace_predict(X)
+
+    def calibrate(self, raw: np.ndarray) -> np.ndarray:
+        return raw if self.calibration is None else self.calibration.apply(raw)
+
+    def predict_matrix(self, X: np.ndarray) -> tuple:
+        """(raw PD, calibrated PD) arrays for a matrix already in model feature order."""
+        raw = self.predict_raw(X)
+        return raw, self.calibrate(raw)
+
+    def predict(self, chunk: pd.DataFrame) -> tuple:
+        """(raw PD, calibrated PD) arrays for one chunk."""
+        return self.predict_matrix(self.feature_matrix(chunk))
+
+    def predict_store_rows(self, store_dir, rows: slice) -> tuple:
+        """(raw PD, calibrated PD) for a row range of a feature store, read from its memory map."""
+        return self.predict_matrix(_open_store(str(store_dir)).matrix(rows, self.feature_names))
+
+    def score_chunk(self, chunk: pd.DataFrame, id_column: str = ID_COLUMN, keep=()) -> pd.DataFrame:
+        """``id_column`` + ``keep`` columns, ``pd_raw`` and calibrated ``pd_score`` for one chunk."""
+        raw, calibrated = self.predict(chunk)
+        out = _passthrough(chunk, id_column, keep)
+        out['pd_raw'] = raw.astype(np.float32)
+        out['pd_score'] = calibrated.astype(np.float32)
+        return out
+
+
+@lru_cache(maxsize=4)
+def _open_store(store_dir: str) -> FeatureStore:
+    return FeatureStore(store_dir)
+
+
+def _passthrough(chunk: pd.DataFrame, id_column: str, keep) -> pd.DataFrame:
+    columns = [c for c in dict.fromkeys((id_column, *keep)) if c and c in chunk.columns]
+    return chunk[columns].reset_index(drop=True)
+
+
+# =============================================================================
+# Incremental writer
+# =============================================================================
+
+class ScoreWriter:
+    """
+    Append scored chunks to a CSV (optionally ``.gz``) or Parquet file.
+
+    Output goes to a temporary sibling and is moved into place on ``close()``,
+    so a crashed run never leaves a truncated file under the final name.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.parquet = self.path.suffix.lower() == '.parquet'
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp = self.path.with_name(self.path.name + '.partial')
+        self._writer = None
+        self._header = True
+        self.rows = 0
+
+    def write(self, frame: pd.DataFrame):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self._tmp, table.schema, compression='snappy')
+            self._writer.write_table(table)
+        else:
+            compression = 'gzip' if self.path.suffix.lower() == '.gz' else None
+            # Appending gzip members yields a valid multi-member gzip stream
+            frame.to_csv(self._tmp, mode='w' if self._header else 'a', header=self._header,
+                         index=False, compression=compression)
+            self._header = False
+        self.rows += len(frame)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._tmp.exists():
+            os.replace(self._tmp, self.path)
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._tmp.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+# =============================================================================
+# Driver (single process or process pool)
+# =============================================================================
+
+_worker_scorer = None
+
+
+def _init_worker(models_dir):
+    global _worker_scorer
+    _worker_scorer = BatchScorer.from_artifacts(models_dir, nthread=1)
+
+
+def _call_in_worker(method, *args):
+    return getattr(_worker_scorer, method)(*args)
+
+
+def _open_scoring_store(source, models_dir: Path, feature_names: list) -> FeatureStore:
+    """Feature store ``source``, checked against the model's features and categorical encoder."""
+    store = _open_store(str(source))
+    missing = [c for c in feature_names if c not in store]
+    if missing:
+        raise ValueError(f"{source} lacks {len(missing)} model features, e.g. '{missing[0]}'")
+    store.check_encoder(load_current_encoder(models_dir / ENCODERS_FILE.name))
+    return store
+
+
+def score_file(source, output, models_dir=MODELS_PATH, chunk_rows: int = CHUNK_ROWS,
+               workers: int = 1, table: str = None, id_column: str = ID_COLUMN, keep=(),
+               progress_callback=None, cache_path=None, cache_max_age_days: float = None) -> dict:
+    """
+    Score ``source`` chunk by chunk into ``output`` and return run statistics.
+
+    ``workers > 1`` scores chunks in a process pool with at most ``2 x workers``
+    chunks in flight, which together with ``chunk_rows`` sets the memory ceiling.
+    With ``cache_path`` (see ``src/score_cache.py``) only rows whose features or
+    model/calibrator version changed since they were last scored are predicted;
+    after the run the cache is pruned of other versions and, with
+    ``cache_max_age_days``, of entries scored longer ago than that.
+    ``progress_callback(rows_done)`` is called after every written chunk.
+
+    A feature store ``source`` is scored by row range; its ``keep`` columns must
+    be stored columns (e.g. ``TARGET``). Cache hashes are always taken over the
+    aligned float32 model matrix, whatever the source format.
+    """
+    keep = tuple(keep)
+    t0 = time.perf_counter()
+    models_dir = Path(models_dir)
+    feature_names = joblib.load(models_dir / 'feature_names.pkl')
+    columns = [*feature_names, id_column, *keep]
+    cache = ScoreCache(cache_path, *artifact_versions(models_dir)) if cache_path else None
+    # With a cache the driver aligns each chunk itself, to hash exactly what the model sees
+    encoder = load_current_encoder(models_dir / ENCODERS_FILE.name) if cache is not None else None
+    store = None
+    if _source_kind(Path(source)) == 'store':
+        store = _open_scoring_store(source, models_dir, feature_names)
+
+    with ExitStack() as stack:
+        if workers <= 1:
+            scorer = []  # loaded on the first miss: a fully cached run never imports xgboost
+
+            def submit(method, *args):
+                if not scorer:
+                    scorer.append(BatchScorer.from_artifacts(models_dir))
+                future = Future()
+                future.set_result(getattr(scorer[0], method)(*args))
+                return future
+        else:
+            pool = stack.enter_context(
+                ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(models_dir,)))
+
+            def submit(method, *args):
+                return pool.submit(_call_in_worker, method, *args)
+
+        writer = stack.enter_context(ScoreWriter(output))
+        if cache is not None:
+            stack.callback(cache.close)
+
+        def dispatch(chunk):
+            out = _passthrough(chunk, id_column, keep)
+            pd_raw = np.full(len(chunk), np.nan)
+            pd_score = np.full(len(chunk), np.nan)
+            if cache is None:
+                return out, pd_raw, pd_score, None, np.arange(len(chunk)), submit('predict', chunk)
+            if id_column not in chunk.columns:
+                raise ValueError(f"Score cache needs an '{id_column}' column")
+            # Hash the aligned float32 matrix, not the chunk: pandas-inferred dtypes (1 vs 1.0) must not matter
+            X = alignment_plan(chunk, feature_names, encoder).transform(chunk)
+            hashes = row_hashes(X)
+            hit, pd_raw, pd_score = cache.lookup(chunk[id_column].to_numpy(), hashes)
+            miss = np.flatnonzero(~hit)
+            future = submit('predict_matrix', X[miss]) if len(miss) else None
+            return out, pd_raw, pd_score, hashes, miss, future
+
+        def dispatch_rows(rows):
+            out = store.to_frame([c for c in dict.fromkeys((id_column, *keep)) if c in store], rows)
+            n = rows.stop - rows.start
+            pd_raw = np.full(n, np.nan)
+            pd_score = np.full(n, np.nan)
+            if cache is None:
+                # Workers map the rows themselves; only the range crosses the process boundary
+                return out, pd_raw, pd_score, None, np.arange(n), submit('predict_store_rows', str(source), rows)
+            if id_column not in out.columns:
+                raise ValueError(f"Score cache needs an '{id_column}' column")
+            X = store.matrix(rows, feature_names)
+            hashes = row_hashes(X)
+            hit, pd_raw, pd_score = cache.lookup(out[id_column].to_numpy(), hashes)
+            miss = np.flatnonzero(~hit)
+            future = submit('predict_matrix', X[miss]) if len(miss) else None
+            return out, pd_raw, pd_score, hashes, miss, future
+
+        def finish(job):
+            out, pd_raw, pd_score, hashes, miss, future = job
+            if future is not None:
+                pd_raw[miss], pd_score[miss] = future.result()
+                if cache is not None:
+                    cache.store(out[id_column].to_numpy()[miss], hashes[miss], pd_raw[miss], pd_score[miss])
+            out['pd_raw'] = pd_raw.astype(np.float32)
+            out['pd_score'] = pd_score.astype(np.float32)
+            writer.write(out)
+            if progress_callback:
+                progress_callback(writer.rows)
+
+        pending = deque()
+        max_in_flight = 2 * workers if workers > 1 else 1
+        if store is not None:
+            jobs = (dispatch_rows(rows) for rows in store.row_ranges(chunk_rows))
+        else:
+            jobs = (dispatch(chunk) for chunk in iter_chunks(source, columns, chunk_rows, table))
+        for job in jobs:
+            pending.append(job)
+            if len(pending) >= max_in_flight:
+                finish(pending.popleft())
+        while pending:
+            finish(pending.popleft())
+        if cache is not None:
+            pruned = cache.prune(cache_max_age_days)
+
+    elapsed = time.perf_counter() - t0
+    stats = {
+        'rows': writer.rows,
+        'seconds': elapsed,
+        'rows_per_second': writer.rows / elapsed if elapsed > 0 else float('inf'),
+        'output': str(output),
+    }
+    if cache is not None:
+        stats['cache'] = {**cache.summary(), 'pruned': pruned}
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream a portfolio file through the calibrated PD model.')
+    parser.add_argument('source', help='Input .csv[.gz], .parquet, SQLite database or feature store directory')
+    parser.add_argument('output', help='Output .csv, .csv.gz or .parquet')
+    parser.add_argument('--table', default=None, help='Table to read when the source is SQLite')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--workers', type=int, default=1, help='Scoring processes (default: 1)')
+    parser.add_argument('--models-dir', default=str(MODELS_PATH))
+    parser.add_argument('--id-column', default=ID_COLUMN)
+    parser.add_argument('--keep', nargs='+', default=(), help='Extra input columns to copy to the output')
+    parser.add_argument('--cache', default=None, help='SQLite score cache; only changed rows are re-scored')
+    parser.add_argument('--cache-max-age-days', type=float, default=None,
+                        help='Also drop cache entries scored longer ago than this')
+    args = parser.parse_args()
+
+    stats = score_file(args.source, args.output, args.models_dir, args.chunk_rows, args.workers,
+                       args.table, args.id_column, args.keep, cache_path=args.cache,
+                       cache_max_age_days=args.cache_max_age_days)
+    print(f"Scored {stats['rows']:,} loans in {stats['seconds']:.1f}s "
+          f"({stats['rows_per_second']:,.0f} rows/s) -> {stats['output']}")
+    if 'cache' in stats:
+        cache = stats['cache']
+        print(f"Score cache: {cache['hits']:,} hits / {cache['misses']:,} misses "
+              f"(hit rate {cache['hit_rate']:.1%}), {cache['pruned']:,} stale entries pruned")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+Compiled raw-score -> calibrated-PD lookup.
+
+NB03 fits an ``IsotonicRegression(out_of_bounds='clip')`` on raw model scores
+(``models/calibrator.pkl``). Its prediction is piecewise-linear interpolation
+over sorted breakpoints, so it compiles to a small ``(x, y)`` table applied with
+one ``searchsorted`` and a multiply-add, with no sklearn on the scoring path.
+Flat runs of the step function are collapsed to their end points, which leaves
+the result unchanged.
+
+The table is saved to ``models/calibration_table.json`` with the model version
+and the SHA-256 of both the model and the calibrator it was compiled against,
+so the calculator, batch scoring, the scoring server and NB04/NB05 all apply
+the same calibration for the same model. NB03 recompiles it whenever it saves
+a new calibrator; ``load_current_table`` refuses a table left over from a
+previous model.
+
+Usage:
+    python -m src.calibration            # compile + parity check against calibrator.predict
+"""
+
+import argparse
+import json
+import sys
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+from .tree_export import MODEL_FILE, MODELS_PATH, file_sha256
+
+CALIBRATOR_FILE = MODELS_PATH / 'calibrator.pkl'
+TABLE_FILE = MODELS_PATH / 'calibration_table.json'
+MODEL_CARD_FILE = MODELS_PATH / 'model_card.json'
+PARITY_TOL = 1e-6
+
+
+def _drop_flat_interior(x: np.ndarray, y: np.ndarray) -> tuple:
+    """Remove breakpoints whose neighbours on both sides share their ``y`` (no effect on interpolation)."""
+    if len(x) < 3:
+        return x, y
+    interior = (y[1:-1] == y[:-2]) & (y[1:-1] == y[2:])
+    keep = np.concatenate([[True], ~interior, [True]])
+    return x[keep], y[keep]
+
+
+class CalibrationTable:
+    """Piecewise-linear calibration map, clipped to the breakpoint range like the isotonic model."""
+
+    def __init__(self, x, y, version: dict = None):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        if len(self.x) < 2 or np.any(np.diff(self.x) <= 0):
+            raise ValueError("Calibration breakpoints must be strictly increasing (at least two)")
+        self.version = dict(version or {})
+        self._slope = np.diff(self.y) / np.diff(self.x)
+
+    def apply(self, raw: np.ndarray) -> np.ndarray:
+        """Calibrated PD for raw model probabilities (any shape)."""
+        # Raw scores are quantized to float32 (the booster's output precision) as the
+        # isotonic model does; some breakpoints are only ~1e-6 apart
+        raw = np.asarray(raw, dtype=np.float32).astype(np.float64)
+        raw = np.clip(raw, self.x[0], self.x[-1])
+        i = np.minimum(np.searchsorted(self.x, raw, side='right') - 1, len(self.x) - 2)
+        return self.y[i] + self._slope[i] * (raw - self.x[i])
+
+    __call__ = apply
+
+    @classmethod
+    def from_isotonic(cls, isotonic, version: dict = None):
+        if getattr(isotonic, 'out_of_bounds', 'clip') != 'clip':
+            raise ValueError("Only out_of_bounds='clip' isotonic calibrators can be compiled")
+        x, y = _drop_flat_interior(np.asarray(isotonic.X_thresholds_, dtype=np.float64),
+                                   np.asarray(isotonic.y_thresholds_, dtype=np.float64))
+        return cls(x, y, version)
+
+    def save(self, path=TABLE_FILE):
+        payload = {**self.version, 'method': 'isotonic', 'out_of_bounds': 'clip',
+                   'x': self.x.tolist(), 'y': self.y.tolist()}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2)
+
+    @classmethod
+    def load(cls, path=TABLE_FILE):
+        with open(path, encoding='utf-8') as f:
+            payload = json.load(f)
+        x, y = payload.pop('x'), payload.pop('y')
+        return cls(x, y, {k: v for k, v in payload.items() if k not in ('method', 'out_of_bounds')})
+
+    def is_current(self, model_path=MODEL_FILE, calibrator_path=CALIBRATOR_FILE) -> bool:
+        """True if compiled against the model and calibrator files currently on disk."""
+        return (self.version.get('model_sha256') == file_sha256(model_path)
+                and self.version.get('calibrator_sha256') == file_sha256(calibrator_path))
+
+
+def load_current_table(models_dir=MODELS_PATH) -> CalibrationTable:
+    """
+    ``calibration_table.json`` from ``models_dir``; raises if it was compiled
+    for a different model or calibrator than the ones next to it.
+    """
+    models_dir = Path(models_dir)
+    table = CalibrationTable.load(models_dir / TABLE_FILE.name)
+    if not table.is_current(models_dir / MODEL_FILE.name, models_dir / CALIBRATOR_FILE.name):
+        raise ValueError(f"{TABLE_FILE.name} was compiled for a different model or calibrator; "
+                         "recompile it with python -m src.calibration")
+    return table
+
+
+def load_isotonic(calibrator_path=CALIBRATOR_FILE):
+    import joblib
+
+    with warnings.catch_warnings():
+        # Pickled with an older scikit-learn release
+        warnings.simplefilter('ignore')
+        return joblib.load(calibrator_path)
+
+
+def compile_calibration(calibrator_path=CALIBRATOR_FILE, model_path=MODEL_FILE,
+                        model_card_path=MODEL_CARD_FILE) -> CalibrationTable:
+    """Compile ``calibrator.pkl`` into a table stamped with the model it belongs to."""
+    model_version = ''
+    if Path(model_card_path).exists():
+        with open(model_card_path, encoding='utf-8') as f:
+            model_version = json.load(f).get('model_metadata', {}).get('model_version', '')
+    version = {
+        'model_version': model_version,
+        'model_sha256': file_sha256(model_path),
+        'calibrator_sha256': file_sha256(calibrator_path),
+    }
+    return CalibrationTable.from_isotonic(load_isotonic(calibrator_path), version)
+
+
+def parity_check(isotonic, table: CalibrationTable, n_points: int = 200_000) -> float:
+    """Max |isotonic.predict - table.apply| over a dense grid, every breakpoint and out-of-range values."""
+    grid = np.concatenate([
+        np.linspace(-0.05, 1.05, n_points),
+        np.asarray(isotonic.X_thresholds_, dtype=np.float64),
+    ])
+    return float(np.max(np.abs(isotonic.predict(grid) - table.apply(grid))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile the isotonic calibrator into a breakpoint table.')
+    parser.add_argument('--calibrator', default=str(CALIBRATOR_FILE))
+    parser.add_argument('--model', default=str(MODEL_FILE))
+    parser.add_argument('--out', default=str(TABLE_FILE))
+    parser.add_argument('--tol', type=float, default=PARITY_TOL)
+    args = parser.parse_args()
+
+    table = compile_calibration(args.calibrator, args.model)
+    table.save(args.out)
+    isotonic = load_isotonic(args.calibrator)
+    print(f"Compiled {len(isotonic.X_thresholds_)} isotonic breakpoints -> {len(table.x)} "
+          f"(model version {table.version['model_version'] or 'n/a'}) -> {args.out}")
+
+    max_diff = parity_check(isotonic, CalibrationTable.load(args.out))
+    print(f"Parity vs calibrator.predict: max |diff| = {max_diff:.2e} (tol {args.tol:.0e})")
+    if max_diff > args.tol:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
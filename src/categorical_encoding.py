@@ -0,0 +1,198 @@
+"""
+Training-consistent categorical encoder without sklearn on the scoring path.
+
+NB03 fits one ``LabelEncoder`` per object column on ``astype(str)`` values and
+pickles them as ``models/label_encoders_v2.pkl``. A fitted ``LabelEncoder`` is
+just its sorted ``classes_``: the code of a label is its position. This module
+compiles those classes into ``models/categorical_encoders.json`` and encodes a
+whole column with one hash factorization: only the distinct values of the batch
+are converted to ``str`` and looked up, and the per-row codes come from one
+``take``. Labels unseen at training time get an explicit unknown code (NaN by
+default, XGBoost's missing-value branch) instead of raising or being appended.
+
+Missing values encode like training, where ``astype(str)`` turned NaN into the
+label ``'nan'``.
+
+Usage:
+    python -m src.categorical_encoding          # compile + parity check against LabelEncoder.transform
+"""
+
+import argparse
+import json
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .tree_export import MODELS_PATH, file_sha256
+
+LABEL_ENCODERS_FILE = MODELS_PATH / 'label_encoders_v2.pkl'
+ENCODERS_FILE = MODELS_PATH / 'categorical_encoders.json'
+MISSING_LABEL = str(np.nan)
+
+
+class CategoricalEncoder:
+    """Per-column sorted training labels; code = position, ``unknown`` for unseen labels."""
+
+    def __init__(self, classes: dict, unknown: float = np.nan, version: dict = None):
+        self.classes = {col: pd.Index(np.asarray(labels, dtype=object)) for col, labels in classes.items()}
+        for col, labels in self.classes.items():
+            if not labels.is_unique:
+                raise ValueError(f"Duplicate labels for '{col}'")
+        self.unknown = float(unknown)
+        self.version = dict(version or {})
+        self._codes = {col: {label: code for code, label in enumerate(labels)}
+                       for col, labels in self.classes.items()}
+
+    @property
+    def columns(self) -> list:
+        return list(self.classes)
+
+    def __contains__(self, column) -> bool:
+        return column in self.classes
+
+    def encode(self, column: str, values) -> np.ndarray:
+        """float32 training codes for ``values`` (any 1-D array-like) of ``column``."""
+        codes, uniques = pd.factorize(pd.Series(values, copy=False), use_na_sentinel=True)
+        # One lookup per distinct value; the last slot serves missing values (code -1)
+        labels = pd.Index(uniques).astype(str).append(pd.Index([MISSING_LABEL]))
+        table = self.classes[column].get_indexer(labels).astype(np.float32)
+        table[table < 0] = self.unknown
+        return table[codes]
+
+    def encode_value(self, column: str, value) -> float:
+        """Training code of a single value (dictionary lookup, for per-request paths)."""
+        return float(self._codes[column].get(str(value), self.unknown))
+
+    def encode_frame(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """Copy of ``frame`` with every encoder column it contains replaced by its codes."""
+        frame = frame.copy()
+        for col in self.classes:
+            if col in frame.columns:
+                frame[col] = self.encode(col, frame[col])
+        return frame
+
+    @classmethod
+    def from_label_encoders(cls, le_dict: dict, unknown: float = np.nan, version: dict = None):
+        return cls({col: list(le.classes_) for col, le in le_dict.items()}, unknown, version)
+
+    def save(self, path=ENCODERS_FILE):
+        payload = {**self.version, 'unknown': None if np.isnan(self.unknown) else self.unknown,
+                   'columns': {col: labels.tolist() for col, labels in self.classes.items()}}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path=ENCODERS_FILE):
+        with open(path, encoding='utf-8') as f:
+            payload = json.load(f)
+        columns, unknown = payload.pop('columns'), payload.pop('unknown')
+        return cls(columns, np.nan if unknown is None else unknown, payload)
+
+    def is_current(self, label_encoders_path=LABEL_ENCODERS_FILE) -> bool:
+        """True if compiled from the label-encoder pickle currently on disk."""
+        return self.version.get('label_encoders_sha256') == file_sha256(label_encoders_path)
+
+
+def load_current_encoder(encoders_path=ENCODERS_FILE) -> CategoricalEncoder:
+    """
+    Compiled encoder at ``encoders_path``; raises if the label-encoder pickle
+    next to it has been refit since the table was compiled.
+    """
+    encoders_path = Path(encoders_path)
+    encoder = CategoricalEncoder.load(encoders_path)
+    source = encoders_path.with_name(encoder.version.get('label_encoders_file', LABEL_ENCODERS_FILE.name))
+    if not encoder.is_current(source):
+        raise ValueError(f"{encoders_path.name} was compiled from a different {source.name}; "
+                         "recompile it with python -m src.categorical_encoding")
+    return encoder
+
+
+def load_label_encoders(path=LABEL_ENCODERS_FILE) -> dict:
+    import joblib
+
+    with warnings.catch_warnings():
+        # Pickled with an older scikit-learn release
+        warnings.simplefilter('ignore')
+        return joblib.load(path)
+
+
+def compile_encoders(label_encoders_path=LABEL_ENCODERS_FILE) -> CategoricalEncoder:
+    """Compile the NB03 label-encoder pickle into a ``CategoricalEncoder`` stamped with its SHA-256."""
+    return CategoricalEncoder.from_label_encoders(
+        load_label_encoders(label_encoders_path),
+        version={'label_encoders_file': Path(label_encoders_path).name,
+                 'label_encoders_sha256': file_sha256(label_encoders_path)},
+    )
+
+
+def parity_sample(le_dict: dict, n_rows: int = 20_000, seed: int = 42) -> pd.DataFrame:
+    """Object columns drawn from the training labels, with ~5% missing and ~5% unseen labels."""
+    rng = np.random.default_rng(seed)
+    data = {}
+    for col, le in le_dict.items():
+        values = rng.choice(np.asarray(le.classes_, dtype=object), n_rows)
+        values[rng.random(n_rows) < 0.05] = np.nan
+        values[rng.random(n_rows) < 0.05] = 'UNSEEN'
+        data[col] = values
+    return pd.DataFrame(data)
+
+
+def parity_check(le_dict: dict, encoder: CategoricalEncoder, frame: pd.DataFrame) -> int:
+    """
+    Number of mismatches against ``LabelEncoder.transform(astype(str))`` on the
+    rows it can encode; rows with unseen labels must get ``encoder.unknown``.
+    """
+    mismatches = 0
+    for col, le in le_dict.items():
+        labels = frame[col].astype(str)
+        known = labels.isin(le.classes_).to_numpy()
+        codes = encoder.encode(col, frame[col])
+        mismatches += int(np.sum(codes[known] != le.transform(labels[known])))
+        unknown = codes[~known]
+        mismatches += int(np.sum(~np.isnan(unknown) if np.isnan(encoder.unknown)
+                                 else unknown != encoder.unknown))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile the NB03 label encoders into a JSON encoder table.')
+    parser.add_argument('--label-encoders', default=str(LABEL_ENCODERS_FILE))
+    parser.add_argument('--out', default=str(ENCODERS_FILE))
+    parser.add_argument('--rows', type=int, default=20_000, help='Synthetic rows for the parity check')
+    args = parser.parse_args()
+
+    encoder = compile_encoders(args.label_encoders)
+    encoder.save(args.out)
+    print(f"Compiled {len(encoder.columns)} categorical columns "
+          f"({sum(len(c) for c in encoder.classes.values())} labels) -> {args.out}")
+
+    le_dict = load_label_encoders(args.label_encoders)
+    frame = parity_sample(le_dict, args.rows)
+    loaded = CategoricalEncoder.load(args.out)
+    mismatches = parity_check(le_dict, loaded, frame)
+    print(f"Parity vs LabelEncoder.transform on {args.rows:,} rows x {len(le_dict)} columns: "
+          f"{mismatches} mismatches")
+
+    # Throughput on the widest column: one transform per value (the old calculator path) vs one encode call
+    col = max(le_dict, key=lambda c: len(le_dict[c].classes_))
+    known = frame[col][frame[col].isin(le_dict[col].classes_)].head(2000)
+    t0 = time.perf_counter()
+    for value in known:
+        le_dict[col].transform([value])
+    per_value = (time.perf_counter() - t0) / len(known)
+    t0 = time.perf_counter()
+    loaded.encode(col, frame[col])
+    vectorized = (time.perf_counter() - t0) / len(frame)
+    print(f"{col}: per-value LabelEncoder.transform {per_value * 1e6:.1f} us/row, "
+          f"vectorized encode {vectorized * 1e6:.3f} us/row")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
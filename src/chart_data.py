@@ -0,0 +1,78 @@
+"""
+Chart-data layer for the dashboard's Plotly figures.
+
+Charts receive pre-aggregated, fixed-size data instead of raw portfolio arrays:
+per-class histogram counts over fixed PD bins and curves decimated with
+Largest-Triangle-Three-Buckets (LTTB). The browser payload and render time stay
+constant whether the portfolio holds 61K or 10M loans.
+"""
+
+import numpy as np
+
+
+def class_histograms(scores: np.ndarray, labels: np.ndarray, bins: int = 50,
+                     lower: float = 0.0, upper: float = 1.0) -> dict:
+    """
+    Fixed-bin PD histograms per class, computed with a single ``bincount`` per class.
+
+    Bins are ``bins`` equal-width intervals on ``[lower, upper]``; scores outside
+    the range are clipped into the edge bins. Returns ``edges``, ``centers``,
+    ``width`` and the ``non_default`` / ``default`` count arrays.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    labels = np.asarray(labels)
+    width = (upper - lower) / bins
+    idx = np.clip(((scores - lower) / width).astype(np.int64), 0, bins - 1)
+    is_default = labels == 1
+
+    edges = lower + width * np.arange(bins + 1)
+    return {
+        'edges': edges,
+        'centers': (edges[:-1] + edges[1:]) / 2,
+        'width': width,
+        'non_default': np.bincount(idx[~is_default], minlength=bins),
+        'default': np.bincount(idx[is_default], minlength=bins),
+    }
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> tuple:
+    """
+    Largest-Triangle-Three-Buckets decimation of a curve with non-decreasing ``x``.
+
+    Keeps the first and last points and, from each of ``n_out - 2`` equal-count
+    buckets in between, the point forming the largest triangle with the previously
+    kept point and the mean of the next bucket. This preserves peaks and knees.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nxt = slice(edges[i + 1], edges[i + 2])
+            cx, cy = x[nxt].mean(), y[nxt].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+
+    return x[keep], y[keep]
+
+
+def decimate_curve(x: np.ndarray, y: np.ndarray, max_points: int = 500) -> tuple:
+    """LTTB-decimate a curve whose ``x`` is monotone in either direction."""
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if len(x) > 1 and x[0] > x[-1]:
+        xd, yd = lttb(x[::-1], y[::-1], max_points)
+        return xd[::-1], yd[::-1]
+    return lttb(x, y, max_points)
@@ -0,0 +1,129 @@
+"""
+Columnar on-disk store: one ``.npy`` file per column plus a JSON manifest.
+
+Columns are memory-mapped read-only with ``np.load(mmap_mode='r')``, so a loader
+only touches the columns it asks for and every process on the box shares the
+same page-cached copy instead of parsing and holding its own DataFrame.
+
+Convert once from CSV:
+    python -m src.column_store test_dashboard.csv test_dashboard_store \\
+        --columns SK_ID_CURR TARGET predicted_pd AMT_CREDIT
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def _source_signature(path: Path) -> dict:
+    stat = path.stat()
+    return {'path': path.name, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+def write_column_store(df: pd.DataFrame, store_dir, source: dict = None, extra: dict = None) -> dict:
+    """
+    Write every column of ``df`` as ``<store_dir>/<column>.npy`` and the manifest last.
+
+    The manifest is what marks a store as complete, so a reader never sees a
+    half-written store. Columns must already be numeric (encode categoricals first).
+    """
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+
+    columns = {}
+    for col in df.columns:
+        values = df[col].to_numpy()
+        if values.dtype == object:
+            raise ValueError(f"Column '{col}' is not numeric; encode it before writing the store")
+        tmp_path = store_dir / f'{col}.npy.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(values))
+        os.replace(tmp_path, store_dir / f'{col}.npy')
+        columns[col] = str(values.dtype)
+
+    manifest = {'n_rows': len(df), 'columns': columns, 'source': source}
+    if extra:
+        manifest.update(extra)
+    tmp_manifest = store_dir / (MANIFEST_NAME + '.tmp')
+    with open(tmp_manifest, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_manifest, store_dir / MANIFEST_NAME)
+    return manifest
+
+
+def convert_csv_to_columns(csv_path, store_dir, columns: list = None) -> dict:
+    """One-time CSV -> column store conversion, reading only the projected columns."""
+    csv_path = Path(csv_path)
+    usecols = None if columns is None else (lambda c: c in set(columns))
+    df = pd.read_csv(csv_path, usecols=usecols)
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    return write_column_store(df, store_dir, source=_source_signature(csv_path))
+
+
+def store_is_current(store_dir, csv_path=None) -> bool:
+    """True when the store exists and (if the CSV is present) was built from its current version."""
+    manifest_path = Path(store_dir) / MANIFEST_NAME
+    if not manifest_path.exists():
+        return False
+    if csv_path is None or not Path(csv_path).exists():
+        return True
+    with open(manifest_path, encoding='utf-8') as f:
+        source = json.load(f).get('source') or {}
+    current = _source_signature(Path(csv_path))
+    return (source.get('mtime_ns'), source.get('size')) == (current['mtime_ns'], current['size'])
+
+
+class ColumnStore:
+    """Read-only, lazily memory-mapped view over a column store directory."""
+
+    def __init__(self, store_dir, mmap_mode: str = 'r'):
+        self.store_dir = Path(store_dir)
+        self.mmap_mode = mmap_mode
+        with open(self.store_dir / MANIFEST_NAME, encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self.columns = list(self.manifest['columns'])
+        self._arrays = {}
+
+    def __len__(self) -> int:
+        return self.manifest['n_rows']
+
+    def __contains__(self, column) -> bool:
+        return column in self.manifest['columns']
+
+    def __getitem__(self, column) -> np.ndarray:
+        """Memory-mapped column (zero-copy; pages are read on first access)."""
+        if column not in self._arrays:
+            if column not in self:
+                raise KeyError(column)
+            self._arrays[column] = np.load(self.store_dir / f'{column}.npy', mmap_mode=self.mmap_mode)
+        return self._arrays[column]
+
+    def to_frame(self, columns: list = None, rows=None) -> pd.DataFrame:
+        """Materialize a DataFrame for the requested columns, optionally a row mask/slice."""
+        columns = self.columns if columns is None else columns
+        if rows is None:
+            return pd.DataFrame({c: np.asarray(self[c]) for c in columns})
+        return pd.DataFrame({c: self[c][rows] for c in columns})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert a CSV into a memory-mappable column store.')
+    parser.add_argument('csv_path')
+    parser.add_argument('store_dir')
+    parser.add_argument('--columns', nargs='+', default=None, help='Columns to keep (default: all)')
+    args = parser.parse_args()
+
+    manifest = convert_csv_to_columns(args.csv_path, args.store_dir, args.columns)
+    print(f"Column store written: {args.store_dir} "
+          f"({manifest['n_rows']:,} rows x {len(manifest['columns'])} columns)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Precompiled source-frame -> model-matrix alignment.
+
+Every scoring path turns a DataFrame into the model's feature matrix the same
+way: pad features the frame does not have, reorder to ``feature_names`` and
+encode the categorical columns. Done per call, that is a Python loop over all
+216 features (column inserts that fragment the frame, a reorder copy and a
+dtype check per column). ``AlignmentPlan`` does the per-column work once per
+(source schema, model): it resolves source positions, constant-fill slots and
+categorical encodings, and ``transform`` then builds the matrix with one
+``take`` into a preallocated float32 buffer. Categorical columns are encoded
+with the training ``CategoricalEncoder`` (one vectorized lookup per column).
+
+Plans are cached per schema by ``alignment_plan``, so a notebook function or a
+chunked reader that sees the same columns again reuses the compiled plan.
+
+Usage:
+    plan = alignment_plan(df, feature_names, encoder, fill_value=0.0)
+    X = plan.transform(df)                                   # (n, 216) float32
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .categorical_encoding import CategoricalEncoder
+
+_MAX_CACHED_PLANS = 64
+
+
+def schema_key(frame: pd.DataFrame) -> tuple:
+    """(column names, dtype names) of ``frame``; equal keys mean a plan can be reused."""
+    return tuple(frame.columns), tuple(str(dtype) for dtype in frame.dtypes)
+
+
+def _is_numeric(dtype) -> bool:
+    return pd.api.types.is_numeric_dtype(dtype) or pd.api.types.is_bool_dtype(dtype)
+
+
+class AlignmentPlan:
+    """
+    Column mapping from one source schema to the model's feature order.
+
+    Columns known to ``encoder`` (a ``CategoricalEncoder``) get their training
+    codes; any other non-numeric column is coerced with ``pd.to_numeric``.
+    Features with no source column get ``fill_value``. With ``na_value`` set,
+    NaNs in the output (gaps, unknown labels) are replaced by it.
+    """
+
+    def __init__(self, feature_names: list, columns, dtypes, encoder: CategoricalEncoder = None,
+                 fill_value: float = np.nan, na_value: float = None):
+        dtypes = list(dtypes)
+        self.feature_names = list(feature_names)
+        self.columns = tuple(columns)
+        self.dtypes = tuple(str(dtype) for dtype in dtypes)
+        self.encoder = encoder
+        self.fill_value = fill_value
+        self.na_value = na_value
+
+        position = {}
+        for i, col in enumerate(self.columns):
+            position.setdefault(col, i)  # first occurrence wins for duplicate names
+
+        numeric_src, encoded = [], []
+        # gather[j] = column of the staging block feeding model feature j
+        source_slot = []
+        for name in self.feature_names:
+            src = position.get(name)
+            categorical = encoder is not None and name in encoder
+            if src is None:
+                source_slot.append(None)
+            elif _is_numeric(dtypes[src]) and not categorical:
+                numeric_src.append(src)
+                source_slot.append(('num', len(numeric_src) - 1))
+            else:
+                # Training codes, or pd.to_numeric for stray non-numeric columns
+                encoded.append((src, name if categorical else None))
+                source_slot.append(('enc', len(encoded) - 1))
+
+        # Staging block layout: [numeric | encoded | fill]; one take() maps it to model order
+        n_numeric, n_encoded = len(numeric_src), len(encoded)
+        fill_col = n_numeric + n_encoded
+        self._numeric_src = np.array(numeric_src, dtype=np.intp)
+        self._encoded = encoded
+        self._gather = np.array([
+            fill_col if slot is None else slot[1] + (0 if slot[0] == 'num' else n_numeric)
+            for slot in source_slot
+        ], dtype=np.intp)
+        self._width = fill_col + 1
+
+    @property
+    def n_filled(self) -> int:
+        """Number of model features with no source column (constant ``fill_value``)."""
+        return int(np.sum(self._gather == self._width - 1))
+
+    def matches(self, frame: pd.DataFrame) -> bool:
+        return schema_key(frame) == (self.columns, self.dtypes)
+
+    def transform(self, frame: pd.DataFrame, out: np.ndarray = None) -> np.ndarray:
+        """(n, n_features) float32 model matrix for ``frame``, written into ``out`` when given."""
+        if not self.matches(frame):
+            raise ValueError("Frame schema differs from the schema this plan was compiled for")
+        n = len(frame)
+        block = np.empty((n, self._width), dtype=np.float32)
+        if len(self._numeric_src):
+            block[:, :len(self._numeric_src)] = frame.iloc[:, self._numeric_src].to_numpy(
+                dtype=np.float32, na_value=np.nan)
+        offset = len(self._numeric_src)
+        for k, (src, name) in enumerate(self._encoded):
+            col = frame.iloc[:, src]
+            if name is None:
+                block[:, offset + k] = pd.to_numeric(col, errors='coerce').to_numpy(dtype=np.float32)
+            else:
+                block[:, offset + k] = self.encoder.encode(name, col)
+        block[:, -1] = self.fill_value
+
+        if out is None:
+            out = np.empty((n, len(self.feature_names)), dtype=np.float32)
+        np.take(block, self._gather, axis=1, out=out)
+        if self.na_value is not None:
+            np.nan_to_num(out, copy=False, nan=self.na_value, posinf=np.inf, neginf=-np.inf)
+        return out
+
+    def frame(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """``transform`` as a DataFrame with ``feature_names`` columns and the source index."""
+        return pd.DataFrame(self.transform(frame), index=frame.index, columns=self.feature_names)
+
+
+_plans = {}
+_plans_lock = threading.Lock()
+
+
+def alignment_plan(frame: pd.DataFrame, feature_names: list, encoder: CategoricalEncoder = None,
+                   fill_value: float = np.nan, na_value: float = None) -> AlignmentPlan:
+    """Plan for ``frame``'s schema, compiled on first use and reused for the same schema and options."""
+    options = (id(encoder), 'nan' if np.isnan(fill_value) else fill_value, na_value)
+    key = (schema_key(frame), tuple(feature_names), options)
+    with _plans_lock:
+        plan = _plans.get(key)
+    # Encoders are keyed by identity; make sure it is still the same object
+    if plan is not None and plan.encoder is encoder:
+        return plan
+
+    plan = AlignmentPlan(feature_names, frame.columns, frame.dtypes, encoder, fill_value, na_value)
+    with _plans_lock:
+        if len(_plans) >= _MAX_CACHED_PLANS:
+            _plans.pop(next(iter(_plans)))
+        _plans[key] = plan
+    return plan
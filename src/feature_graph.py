@@ -0,0 +1,245 @@
+"""
+Declarative graph of the derived application features.
+
+The NB02 ratio, age, external-score and document features used to be written
+out three times: in NB02 (``src/feature_engineering.py``), in the risk
+calculator (``src/application_scoring.py``) and in the NB05 stress test. The
+copies had drifted; the calculator computed ``EXT_SCORE_x_DEBT_RATIO`` from
+``DEBT_TO_INCOME`` where training uses ``INCOME_TO_CREDIT``, and the stress
+test scaled ``PAYMENT_BURDEN`` without its ``EXT_SCORE_x_*`` interaction. Here
+each feature is declared once: a name, the columns it is computed from and a
+vectorized expression. Any name that is not a feature (``AMT_CREDIT``,
+``DAYS_BIRTH``, ...) is a base input.
+
+- ``evaluate(data, outputs)`` computes ``outputs`` from the base inputs,
+  running only the subgraph they need.
+- ``recompute(values, overrides)`` takes already computed features, replaces
+  some inputs (a stress scenario, the calculator fields) and recomputes only
+  their descendants; every other feature is reused from ``values``.
+
+``data`` / ``values`` is a DataFrame (batch) or a mapping of scalars (one row);
+expressions are written to work on both. Plans are cached per request shape.
+
+Usage:
+    python -m src.feature_graph                                     # list the features and their inputs
+    python -m src.feature_graph --outputs EXT_SCORE_x_DEBT_RATIO    # subgraph needed for these outputs
+    python -m src.feature_graph --override AMT_INCOME_TOTAL         # features a stress on these inputs recomputes
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+UNEMPLOYED_DAYS = 365243
+EXT_COLUMNS = ['EXT_SOURCE_1', 'EXT_SOURCE_2', 'EXT_SOURCE_3']
+DOCUMENT_COLUMNS = [f'FLAG_DOCUMENT_{i}' for i in range(2, 22)]
+
+
+class Feature:
+    """A named feature: ``fn(*inputs)`` on whole columns, or on scalars for one row."""
+
+    def __init__(self, name: str, inputs, fn):
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.fn = fn
+
+
+class FeatureGraph:
+    """Features in dependency order, with cached evaluation plans."""
+
+    def __init__(self, features: list):
+        by_name = {}
+        for feature in features:
+            if feature.name in by_name:
+                raise ValueError(f"Feature '{feature.name}' is defined twice")
+            by_name[feature.name] = feature
+
+        # Depth-first topological order; a feature reachable from itself is a cycle
+        order, state = [], {}
+
+        def visit(name, path):
+            if state.get(name) == 'done' or name not in by_name:
+                return
+            if state.get(name) == 'active':
+                raise ValueError(f"Dependency cycle: {' -> '.join([*path, name])}")
+            state[name] = 'active'
+            for parent in by_name[name].inputs:
+                visit(parent, [*path, name])
+            state[name] = 'done'
+            order.append(by_name[name])
+
+        for feature in features:
+            visit(feature.name, [])
+
+        self.features = {feature.name: feature for feature in order}
+        self.inputs = sorted({name for f in order for name in f.inputs if name not in by_name})
+        self._children = {}
+        for feature in order:
+            for parent in feature.inputs:
+                self._children.setdefault(parent, set()).add(feature.name)
+        self._plans = {}
+
+    def __contains__(self, name) -> bool:
+        return name in self.features or name in self._children
+
+    def ancestors(self, names) -> set:
+        """``names`` and every feature and base input they are computed from."""
+        seen, stack = set(), list(names)
+        while stack:
+            name = stack.pop()
+            if name not in seen:
+                seen.add(name)
+                stack.extend(self.features[name].inputs if name in self.features else ())
+        return seen
+
+    def descendants(self, names) -> set:
+        """Features computed, directly or not, from any of ``names`` (``names`` excluded)."""
+        seen, stack = set(), [child for name in names for child in self._children.get(name, ())]
+        while stack:
+            name = stack.pop()
+            if name not in seen:
+                seen.add(name)
+                stack.extend(self._children.get(name, ()))
+        return seen - set(names)
+
+    def plan(self, outputs=None, overrides=()) -> list:
+        """
+        Features to compute, in dependency order. Without ``overrides`` that is
+        the subgraph behind ``outputs`` (default: every feature); with them, only
+        the overrides' descendants that ``outputs`` depend on.
+        """
+        outputs = tuple(self.features) if outputs is None else tuple(outputs)
+        key = (outputs, frozenset(overrides))
+        if key not in self._plans:
+            unknown = [name for name in outputs if name not in self]
+            if unknown:
+                raise KeyError(f"Unknown feature(s) {unknown}")
+            needed = self.ancestors(outputs)
+            if overrides:
+                needed &= self.descendants(overrides)
+            needed -= set(overrides)
+            self._plans[key] = [f for f in self.features.values() if f.name in needed]
+        return self._plans[key]
+
+    @staticmethod
+    def _run(plan: list, lookup) -> dict:
+        computed = {}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for feature in plan:
+                computed[feature.name] = feature.fn(*[computed[name] if name in computed else lookup(name)
+                                                     for name in feature.inputs])
+        return computed
+
+    @staticmethod
+    def _reader(data):
+        if isinstance(data, pd.DataFrame):
+            return data.__getitem__
+        # One row: NumPy scalars, so x / 0 is inf (as in a column) instead of ZeroDivisionError
+        return lambda name: np.asarray(data[name])
+
+    @staticmethod
+    def _result(data, columns: dict):
+        if isinstance(data, pd.DataFrame):
+            return pd.DataFrame(columns, index=data.index)
+        return columns
+
+    def evaluate(self, data, outputs=None):
+        """``outputs`` (default: every feature) computed from the base inputs in ``data``."""
+        outputs = list(self.features) if outputs is None else list(outputs)
+        read = self._reader(data)
+        computed = self._run(self.plan(outputs), read)
+        return self._result(data, {name: computed[name] if name in computed else read(name) for name in outputs})
+
+    def recompute(self, values, overrides: dict, outputs=None):
+        """
+        ``overrides`` plus every feature that depends on them, recomputed from
+        ``values`` (already evaluated features and inputs) with the overrides
+        applied. Features that do not depend on an override are not touched;
+        ``outputs`` limits the recomputation to what they need.
+        """
+        read = self._reader(values)
+        given = {name: (value if isinstance(values, pd.DataFrame) else np.asarray(value))
+                 for name, value in overrides.items()}
+        computed = self._run(self.plan(outputs, tuple(overrides)),
+                             lambda name: given[name] if name in given else read(name))
+        return self._result(values, {**given, **computed})
+
+
+# =============================================================================
+# NB02 §2 application features
+# =============================================================================
+
+def _nan_mean(*columns):
+    # pandas mean(axis=1): sum of the present values over their count (NaN if none)
+    present = [~np.isnan(c) for c in columns]
+    return sum(np.where(p, c, 0.0) for p, c in zip(present, columns)) / sum(present)
+
+
+def _missing_count(*columns):
+    return sum(np.isnan(c).astype(np.int64) for c in columns)
+
+
+def _row_sum(*columns):
+    # pandas sum(axis=1): integer flags sum to int64, missing values count as 0
+    stacked = np.stack(np.broadcast_arrays(*[np.asarray(c) for c in columns]), axis=-1)
+    if stacked.dtype.kind == 'f':
+        return np.nansum(stacked, axis=-1)
+    return stacked.sum(axis=-1, dtype=np.int64)
+
+
+def _employment_years(days_employed):
+    return np.where(np.asarray(days_employed) == UNEMPLOYED_DAYS, np.nan, -np.asarray(days_employed) / 365.25)
+
+
+APPLICATION_GRAPH = FeatureGraph([
+    # Ratios
+    Feature('DEBT_TO_INCOME', ['AMT_CREDIT', 'AMT_INCOME_TOTAL'], lambda credit, income: credit / income),
+    Feature('PAYMENT_BURDEN', ['AMT_ANNUITY', 'AMT_INCOME_TOTAL'], lambda annuity, income: annuity / income),
+    Feature('CREDIT_TO_GOODS', ['AMT_CREDIT', 'AMT_GOODS_PRICE'], lambda credit, goods: credit / goods),
+    Feature('ANNUITY_TO_CREDIT', ['AMT_ANNUITY', 'AMT_CREDIT'], lambda annuity, credit: annuity / credit),
+    Feature('INCOME_PER_PERSON', ['AMT_INCOME_TOTAL', 'CNT_FAM_MEMBERS'], lambda income, members: income / members),
+    Feature('INCOME_TO_CREDIT', ['AMT_INCOME_TOTAL', 'AMT_CREDIT'], lambda income, credit: income / credit),
+    # Time
+    Feature('AGE_YEARS', ['DAYS_BIRTH'], lambda days: -days / 365.25),
+    Feature('EMPLOYMENT_YEARS', ['DAYS_EMPLOYED'], _employment_years),
+    Feature('FLAG_UNEMPLOYED', ['DAYS_EMPLOYED'], lambda days: (days == UNEMPLOYED_DAYS).astype(int)),
+    Feature('REGISTRATION_YEARS', ['DAYS_REGISTRATION'], lambda days: -days / 365.25),
+    Feature('ID_PUBLISH_YEARS', ['DAYS_ID_PUBLISH'], lambda days: -days / 365.25),
+    Feature('EMPLOYMENT_TO_AGE', ['EMPLOYMENT_YEARS', 'AGE_YEARS'], lambda employment, age: employment / age),
+    # External scores (row statistics skip missing scores, as pandas does)
+    Feature('EXT_SOURCE_MEAN', EXT_COLUMNS, _nan_mean),
+    Feature('EXT_SOURCE_WEIGHTED', EXT_COLUMNS, lambda e1, e2, e3: e1 * 0.2 + e2 * 0.4 + e3 * 0.4),
+    Feature('EXT_SOURCE_PRODUCT', EXT_COLUMNS, lambda e1, e2, e3: e1 * e2 * e3),
+    Feature('EXT_SOURCE_MIN', EXT_COLUMNS, lambda e1, e2, e3: np.fmin(np.fmin(e1, e2), e3)),
+    Feature('EXT_SOURCE_MAX', EXT_COLUMNS, lambda e1, e2, e3: np.fmax(np.fmax(e1, e2), e3)),
+    Feature('EXT_SOURCE_MISSING_COUNT', EXT_COLUMNS, _missing_count),
+    # Interactions
+    Feature('EXT_SCORE_x_PAYMENT_BURDEN', ['EXT_SOURCE_MEAN', 'PAYMENT_BURDEN'], lambda ext, burden: ext * burden),
+    Feature('EXT_SCORE_x_AGE', ['EXT_SOURCE_MEAN', 'AGE_YEARS'], lambda ext, age: ext * age),
+    Feature('EXT_SCORE_x_DEBT_RATIO', ['EXT_SOURCE_MEAN', 'INCOME_TO_CREDIT'], lambda ext, ratio: ext * ratio),
+    # Documents
+    Feature('DOCUMENTS_PROVIDED_COUNT', DOCUMENT_COLUMNS, _row_sum),
+    Feature('DOCUMENTS_PROVIDED_RATIO', ['DOCUMENTS_PROVIDED_COUNT'], lambda count: count / len(DOCUMENT_COLUMNS)),
+])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show the derived application features and their evaluation plans.')
+    parser.add_argument('--outputs', nargs='+', default=None, help='Features to produce (default: all)')
+    parser.add_argument('--override', nargs='+', default=(), help='Inputs replaced by a scenario')
+    args = parser.parse_args()
+
+    graph = APPLICATION_GRAPH
+    plan = graph.plan(args.outputs, tuple(args.override))
+    if args.outputs is None and not args.override:
+        print(f"{len(graph.features)} features from {len(graph.inputs)} base inputs")
+    else:
+        kind = f"recomputed after overriding {', '.join(args.override)}" if args.override else 'evaluated'
+        print(f"{len(plan)} of {len(graph.features)} features {kind}")
+    for feature in plan:
+        print(f"   {feature.name:<28} <- {', '.join(feature.inputs)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+"""
+Compact float32 feature store shared by every scoring, SHAP and stress worker.
+
+``features_train.csv`` (307k rows x 216 features) parsed with default inference
+is a float64/object DataFrame of several hundred MB per process. The store keeps
+the engineered matrix in the column-store layout (``src/column_store.py``: one
+``.npy`` per column plus a JSON manifest): numeric features as float32,
+categoricals as int16 training codes (``-1`` for missing or unseen labels), the
+ID as int64 and ``TARGET`` as int8, so it is about half the size of the CSV and
+is memory-mapped read-only. Workers that open the same store share one
+page-cached copy and read only the rows and columns they ask for.
+
+The manifest is the schema header: feature names and order, per-column dtypes,
+which columns are categorical and a fingerprint of the ``CategoricalEncoder``
+the codes came from. A store built with another encoder is refused instead of
+silently producing shifted codes.
+
+Conversion streams the CSV in chunks, so it never holds the full table either.
+
+Usage:
+    python -m src.feature_store data/processed/features_train.csv data/processed/feature_store
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .categorical_encoding import ENCODERS_FILE, CategoricalEncoder, load_current_encoder
+from .column_store import MANIFEST_NAME, ColumnStore, _source_signature
+
+STORE_KIND = 'feature_store'
+FORMAT_VERSION = 1
+ID_COLUMN = 'SK_ID_CURR'
+EXTRA_COLUMNS = ('TARGET',)
+# Non-feature columns with a fixed dtype; any other extra column is stored as float32
+COLUMN_DTYPES = {ID_COLUMN: np.int64, 'TARGET': np.int8}
+CHUNK_ROWS = 50_000
+UNKNOWN_CODE = -1
+
+
+def encoder_fingerprint(encoder: CategoricalEncoder) -> str:
+    """SHA-256 of the encoder's labels: equal fingerprints mean identical codes."""
+    payload = json.dumps({col: labels.tolist() for col, labels in encoder.classes.items()}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def is_feature_store(path) -> bool:
+    manifest_path = Path(path) / MANIFEST_NAME
+    if not manifest_path.is_file():
+        return False
+    with open(manifest_path, encoding='utf-8') as f:
+        return json.load(f).get('kind') == STORE_KIND
+
+
+class FeatureStoreWriter:
+    """
+    Append DataFrame chunks to a feature store; ``close()`` publishes it.
+
+    Each column is streamed to a raw temporary file and wrapped into ``.npy``
+    once the row count is known; the manifest is written last, so readers never
+    see a half-written store.
+    """
+
+    def __init__(self, store_dir, encoder: CategoricalEncoder, feature_names: list,
+                 id_column: str = ID_COLUMN, extra_columns=EXTRA_COLUMNS, source: dict = None):
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.encoder = encoder
+        self.feature_names = list(feature_names)
+        self.categorical = [c for c in self.feature_names if c in encoder]
+        self.id_column = id_column
+        self.extra_columns = [c for c in extra_columns if c not in self.feature_names]
+        self.source = source
+        self.n_rows = 0
+        self._dtypes = {}
+        self._files = {}
+
+    def _column_values(self, chunk: pd.DataFrame, col: str) -> np.ndarray:
+        if col in self.categorical:
+            codes = self.encoder.encode(col, chunk[col])
+            return np.where(np.isnan(codes), UNKNOWN_CODE, codes).astype(np.int16)
+        if col in self.feature_names:
+            return pd.to_numeric(chunk[col], errors='coerce').to_numpy(dtype=np.float32)
+        return pd.to_numeric(chunk[col]).to_numpy(dtype=COLUMN_DTYPES.get(col, np.float32))
+
+    def append(self, chunk: pd.DataFrame):
+        missing = [c for c in self.feature_names if c not in chunk.columns]
+        if missing:
+            raise ValueError(f"Chunk is missing {len(missing)} feature columns, e.g. '{missing[0]}'")
+        columns = [c for c in (self.id_column, *self.extra_columns) if c in chunk.columns]
+        for col in dict.fromkeys([*columns, *self.feature_names]):
+            values = self._column_values(chunk, col)
+            dtype = self._dtypes.setdefault(col, values.dtype)
+            if col not in self._files:
+                if self.n_rows:
+                    raise ValueError(f"Column '{col}' first appears after row {self.n_rows}")
+                self._files[col] = open(self.store_dir / f'{col}.raw.tmp', 'wb')
+            self._files[col].write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+        self.n_rows += len(chunk)
+
+    def close(self) -> dict:
+        columns = {}
+        for col, raw in self._files.items():
+            raw.close()
+            dtype = np.dtype(self._dtypes[col])
+            header = {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False,
+                      'shape': (self.n_rows,)}
+            tmp_path = self.store_dir / f'{col}.npy.tmp'
+            with open(tmp_path, 'wb') as out, open(raw.name, 'rb') as data:
+                np.lib.format.write_array_header_1_0(out, header)
+                shutil.copyfileobj(data, out, 1 << 20)
+            os.remove(raw.name)
+            os.replace(tmp_path, self.store_dir / f'{col}.npy')
+            columns[col] = str(dtype)
+
+        manifest = {
+            'n_rows': self.n_rows, 'columns': columns, 'source': self.source,
+            'kind': STORE_KIND, 'format_version': FORMAT_VERSION,
+            'feature_names': self.feature_names, 'categorical': self.categorical,
+            'id_column': self.id_column if self.id_column in columns else None,
+            'encoder_sha256': encoder_fingerprint(self.encoder), 'encoder_version': self.encoder.version,
+        }
+        tmp_manifest = self.store_dir / (MANIFEST_NAME + '.tmp')
+        with open(tmp_manifest, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_manifest, self.store_dir / MANIFEST_NAME)
+        return manifest
+
+    def abort(self):
+        for raw in self._files.values():
+            raw.close()
+            os.remove(raw.name)
+        self._files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def convert_csv_to_feature_store(csv_path, store_dir, encoder: CategoricalEncoder, feature_names: list,
+                                 id_column: str = ID_COLUMN, extra_columns=EXTRA_COLUMNS,
+                                 chunk_rows: int = CHUNK_ROWS) -> dict:
+    """One-time CSV -> feature store conversion, ``chunk_rows`` at a time, reading only the needed columns."""
+    csv_path = Path(csv_path)
+    wanted = {*feature_names, id_column, *extra_columns}
+    writer = FeatureStoreWriter(store_dir, encoder, feature_names, id_column, extra_columns,
+                                source=_source_signature(csv_path))
+    with writer:
+        for chunk in pd.read_csv(csv_path, usecols=lambda c: c in wanted, chunksize=chunk_rows,
+                                 low_memory=False):
+            writer.append(chunk)
+    return json.loads((Path(store_dir) / MANIFEST_NAME).read_text(encoding='utf-8'))
+
+
+def add_store_columns(store_dir, columns: dict) -> dict:
+    """
+    Add or replace non-model columns (``{name: values}``, row-aligned with the
+    store) as float32. ``feature_names`` is unchanged, so scoring ignores them;
+    the manifest is rewritten last.
+    """
+    store_dir = Path(store_dir)
+    manifest = FeatureStore(store_dir).manifest
+    clash = [col for col in columns if col in manifest['feature_names'] or col == manifest.get('id_column')]
+    if clash:
+        raise ValueError(f"Cannot overwrite model feature or ID column '{clash[0]}'")
+    for col, values in columns.items():
+        values = np.ascontiguousarray(values, dtype=np.float32)
+        if values.shape != (manifest['n_rows'],):
+            raise ValueError(f"Column '{col}' has shape {values.shape}, the store has {manifest['n_rows']} rows")
+        tmp_path = store_dir / f'{col}.npy.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, values)
+        os.replace(tmp_path, store_dir / f'{col}.npy')
+        manifest['columns'][col] = str(values.dtype)
+    tmp_manifest = store_dir / (MANIFEST_NAME + '.tmp')
+    with open(tmp_manifest, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_manifest, store_dir / MANIFEST_NAME)
+    return manifest
+
+
+class FeatureStore(ColumnStore):
+    """Memory-mapped feature store; ``matrix()`` returns model-ready float32 rows."""
+
+    def __init__(self, store_dir, mmap_mode: str = 'r'):
+        super().__init__(store_dir, mmap_mode)
+        if self.manifest.get('kind') != STORE_KIND:
+            raise ValueError(f"{self.store_dir} is a column store, not a feature store")
+        if self.manifest.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported feature store format {self.manifest.get('format_version')}")
+        self.feature_names = self.manifest['feature_names']
+        self.categorical = set(self.manifest['categorical'])
+        self.id_column = self.manifest.get('id_column')
+
+    def check_encoder(self, encoder: CategoricalEncoder):
+        """Raise if the store's categorical codes were produced by a different encoder."""
+        if self.manifest['encoder_sha256'] != encoder_fingerprint(encoder):
+            raise ValueError(f"{self.store_dir} was built with a different categorical encoder; rebuild it")
+
+    def row_ranges(self, chunk_rows: int = CHUNK_ROWS):
+        """``slice`` objects covering the store in order, ``chunk_rows`` rows each."""
+        return [slice(start, min(start + chunk_rows, len(self)))
+                for start in range(0, len(self), chunk_rows)]
+
+    def matrix(self, rows=None, columns: list = None, out: np.ndarray = None) -> np.ndarray:
+        """
+        (n, len(columns)) float32 model matrix for ``rows`` (a slice, index array
+        or mask; all rows when ``None``). Categorical codes are returned as
+        floats with unknown/missing (``-1``) as NaN. Only the requested pages are read.
+        """
+        columns = self.feature_names if columns is None else list(columns)
+        rows = slice(None) if rows is None else rows
+        for j, col in enumerate(columns):
+            values = self[col][rows]
+            if out is None:
+                out = np.empty((len(values), len(columns)), dtype=np.float32)
+            out[:, j] = values
+            if col in self.categorical:
+                out[values == UNKNOWN_CODE, j] = np.nan
+        return out
+
+    def ids(self, rows=None) -> np.ndarray:
+        if self.id_column is None:
+            raise KeyError("Feature store has no ID column")
+        return np.asarray(self[self.id_column][slice(None) if rows is None else rows])
+
+    def size_bytes(self) -> int:
+        return sum((self.store_dir / f'{col}.npy').stat().st_size for col in self.columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert engineered features to a memory-mapped float32 feature store.')
+    parser.add_argument('csv_path')
+    parser.add_argument('store_dir')
+    parser.add_argument('--encoders', default=str(ENCODERS_FILE), help='Compiled categorical encoder (JSON)')
+    parser.add_argument('--feature-names', default=None,
+                        help='feature_names.pkl (default: next to the encoder file)')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    import joblib
+
+    encoder = load_current_encoder(args.encoders)
+    feature_names = joblib.load(args.feature_names or Path(args.encoders).with_name('feature_names.pkl'))
+    manifest = convert_csv_to_feature_store(args.csv_path, args.store_dir, encoder, feature_names,
+                                            chunk_rows=args.chunk_rows)
+    store = FeatureStore(args.store_dir)
+    csv_mb = Path(args.csv_path).stat().st_size / 1e6
+    print(f"Feature store written: {args.store_dir} ({manifest['n_rows']:,} rows x "
+          f"{len(manifest['feature_names'])} features, {len(manifest['categorical'])} categorical; "
+          f"{store.size_bytes() / 1e6:,.0f} MB vs {csv_mb:,.0f} MB CSV)")
+
+
+if __name__ == '__main__':
+    main()
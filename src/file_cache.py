@@ -0,0 +1,82 @@
+"""
+File-backed cache with change detection for files other processes rewrite.
+
+Entries are keyed on the file's (mtime, size) signature: a rerun costs one
+``stat`` call, and the file is re-read and re-parsed only after the surveillance
+run (NB05) actually rewrites it. Large append-only logs are never held in the
+cache; they are read in chunks only when a download is requested.
+"""
+
+import gzip
+import io
+import json
+import threading
+from pathlib import Path
+
+CHUNK_SIZE = 1 << 20
+
+
+def file_signature(path) -> tuple:
+    """(mtime_ns, size) of ``path``, or ``None`` if it does not exist."""
+    try:
+        stat = Path(path).stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def read_json(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def read_text(path) -> str:
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+class FileCache:
+    """Thread-safe, process-wide cache of parsed file contents keyed by (path, mtime, size)."""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def load(self, path, loader=read_json):
+        """``loader(path)``, re-run only when the file's signature changes; ``None`` if missing."""
+        path = Path(path)
+        signature = file_signature(path)
+        if signature is None:
+            with self._lock:
+                self._entries.pop(path, None)
+            return None
+
+        with self._lock:
+            cached = self._entries.get(path)
+        if cached is not None and cached[0] == signature and cached[1] is loader:
+            return cached[2]
+
+        value = loader(path)
+        with self._lock:
+            self._entries[path] = (signature, loader, value)
+        return value
+
+
+def read_file_chunked(path, compress: bool = False, chunk_size: int = CHUNK_SIZE) -> bytes:
+    """
+    File contents for a download, read ``chunk_size`` bytes at a time.
+
+    With ``compress=True`` each chunk is fed through gzip as it is read, so only
+    the compressed output is accumulated (text logs shrink roughly 10x).
+    """
+    buffer = io.BytesIO()
+    sink = gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0) if compress else buffer
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            sink.write(chunk)
+    if compress:
+        sink.close()
+    return buffer.getvalue()
@@ -0,0 +1,69 @@
+"""
+Decoded-once cache for the report PNGs shown in the dashboard.
+
+Each image is decoded a single time per process, downscaled to a display-sized
+palette thumbnail and kept as encoded PNG bytes (never as a decoded bitmap),
+keyed by path and mtime so a notebook re-run that rewrites ``reports/`` is
+picked up automatically. The full-resolution file is only read when explicitly
+requested.
+"""
+
+import io
+import threading
+from pathlib import Path
+
+from PIL import Image
+
+DISPLAY_WIDTH = 1000
+
+
+class ImageAssetCache:
+    """Thread-safe cache of display-sized PNG thumbnails, keyed by (path, mtime)."""
+
+    def __init__(self, max_width: int = DISPLAY_WIDTH):
+        self.max_width = max_width
+        self._thumbnails = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _mtime(path: Path):
+        try:
+            return path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _make_thumbnail(self, path: Path) -> bytes:
+        with Image.open(path) as img:
+            if img.width <= self.max_width:
+                return path.read_bytes()
+            img.load()
+            height = round(img.height * self.max_width / img.width)
+            thumb = img.resize((self.max_width, height), Image.LANCZOS)
+        # Matplotlib charts have few distinct colors; a 256-color palette keeps
+        # them visually identical and several times smaller than RGBA
+        thumb = thumb.quantize(colors=256, method=Image.Quantize.FASTOCTREE)
+        buffer = io.BytesIO()
+        thumb.save(buffer, format='PNG', optimize=True)
+        return buffer.getvalue()
+
+    def thumbnail(self, path) -> bytes:
+        """Display-sized PNG bytes, or ``None`` if the file does not exist."""
+        path = Path(path)
+        mtime = self._mtime(path)
+        if mtime is None:
+            return None
+        with self._lock:
+            cached = self._thumbnails.get(path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+
+        data = self._make_thumbnail(path)
+        with self._lock:
+            self._thumbnails[path] = (mtime, data)
+        return data
+
+    @staticmethod
+    def full_resolution(path) -> bytes:
+        """Original file bytes (not cached), or ``None`` if the file does not exist."""
+        path = Path(path)
+        return path.read_bytes() if path.exists() else None
@@ -0,0 +1,195 @@
+"""
+Incremental refresh of the bureau / previous-application features in the feature store.
+
+A full NB02 rebuild re-reads ``bureau.csv`` (1.7M rows) and
+``previous_application.csv`` (1.7M rows) although only a few borrowers get new
+records each day. This module keeps a mergeable partial state per borrower
+(counts, sums, non-missing counts, min, max and level counts; see
+``src/feature_engineering.py``) next to the feature store, aligned with its
+rows. A refresh reads only the delta files, aggregates them per ``SK_ID_CURR``,
+merges the result into the stored state of the touched borrowers, recomputes
+their ``BUREAU_*``, ``PREV_*`` and ``HAS_*`` features and writes those rows in
+place in the memory-mapped store. The work is proportional to the delta.
+
+Deltas are new records. A corrected record must not be sent as a delta,
+because min/max cannot be un-merged; rebuild the state with ``init`` instead.
+Each delta is fingerprinted and a delta that was already applied is refused,
+so re-running a day does not double-count it. Refresh while no scoring run is
+reading the store.
+
+Borrowers without an application row in the store are reported and skipped.
+They enter with the next full build.
+
+Usage:
+    python -m src.incremental_features init data/processed/feature_store \\
+        --bureau data/raw/bureau.csv --prev data/raw/previous_application.csv
+    python -m src.incremental_features refresh data/processed/feature_store \\
+        --bureau bureau_2026-10-18.csv --prev previous_application_2026-10-18.csv
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from . import feature_engineering as fe
+from .column_store import MANIFEST_NAME, ColumnStore, write_column_store
+from .feature_store import FeatureStore
+from .ingestion import read_table
+
+STATE_DIR = 'history_state'
+TABLES = {
+    'bureau': (fe.BUREAU_STATE, fe.bureau_features_from_state),
+    'previous_application': (fe.PREV_STATE, fe.previous_application_features_from_state),
+}
+
+
+def read_delta(path, table: str) -> pd.DataFrame:
+    """A CSV or Parquet delta file with the declared ``table`` schema (``src/ingestion.py``)."""
+    return read_table(path, table)
+
+
+def delta_fingerprint(delta: pd.DataFrame) -> str:
+    """Content hash of a delta (row order matters), used to refuse re-applying it."""
+    hashes = pd.util.hash_pandas_object(delta.reset_index(drop=True), index=True).to_numpy()
+    return hashlib.sha256(hashes.tobytes()).hexdigest()
+
+
+def _state_dir(store_dir, table: str) -> Path:
+    return Path(store_dir) / STATE_DIR / table
+
+
+def _write_manifest(store_dir: Path, manifest: dict):
+    tmp = store_dir / (MANIFEST_NAME + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, store_dir / MANIFEST_NAME)
+
+
+def _ids_fingerprint(ids: np.ndarray) -> str:
+    return hashlib.sha256(np.ascontiguousarray(ids, dtype=np.int64).tobytes()).hexdigest()
+
+
+def history_columns(store: FeatureStore) -> list:
+    """Feature-store columns owned by the history tables."""
+    return [c for c in store.feature_names
+            if c.startswith(('BUREAU_', 'PREV_')) or c in ('HAS_BUREAU_HISTORY', 'HAS_PREV_APPLICATION')]
+
+
+def init_history_state(store_dir, tables: dict) -> dict:
+    """
+    Build the partial state of every store row from full history tables
+    (``{'bureau': df, 'previous_application': df}``); returns rows covered per table.
+    """
+    ids = FeatureStore(store_dir).ids()
+    covered = {}
+    for table, frame in tables.items():
+        spec = TABLES[table][0]
+        state = fe.partial_state(frame, spec)
+        covered[table] = int(state.index.isin(ids).sum())
+        state = fe.align_state(state, spec, pd.Index(ids, name=fe.ID_COLUMN))
+        write_column_store(state.reset_index(drop=True), _state_dir(store_dir, table),
+                           extra={'kind': 'history_state', 'table': table, 'created_at': time.time(),
+                                  'store_ids_sha256': _ids_fingerprint(ids), 'applied_deltas': []})
+    return covered
+
+
+def refresh_history_features(store_dir, deltas: dict) -> dict:
+    """
+    Fold ``deltas`` (``{'bureau': df, 'previous_application': df}``, new records
+    only) into the stored states and rewrite the history features of the touched
+    borrowers in place. Returns refresh statistics.
+    """
+    t0 = time.perf_counter()
+    store_dir = Path(store_dir)
+    store = FeatureStore(store_dir, mmap_mode='r+')
+    row_of = pd.Index(store.ids())
+
+    touched = pd.Index(np.unique(np.concatenate(
+        [frame[fe.ID_COLUMN].to_numpy() for frame in deltas.values()] or [np.empty(0, np.int64)])))
+    rows = row_of.get_indexer(touched)
+    unknown = int((rows < 0).sum())
+    rows = np.sort(rows[rows >= 0])
+    index = pd.Index(row_of[rows], name=fe.ID_COLUMN)
+
+    state_stores = {table: ColumnStore(_state_dir(store_dir, table), mmap_mode='r+') for table in TABLES}
+    ids_sha256 = _ids_fingerprint(row_of.to_numpy())
+    for table, state_store in state_stores.items():
+        # States are row-aligned with the store; a rebuilt store needs a new init
+        if state_store.manifest.get('store_ids_sha256') != ids_sha256:
+            raise ValueError(f"The {table} history state does not match the rows of {store_dir}; run init")
+    fingerprints = {table: delta_fingerprint(delta) for table, delta in deltas.items() if len(delta)}
+    for table, fingerprint in fingerprints.items():
+        if fingerprint in state_stores[table].manifest.get('applied_deltas', []):
+            raise ValueError(f"This {table} delta was already applied to {store_dir}")
+
+    states, applied = {}, []
+    for table, (spec, _) in TABLES.items():
+        state_store = state_stores[table]
+        state = pd.DataFrame({col: state_store[col][rows] for col in fe.state_columns(spec)}, index=index)
+        if table in fingerprints:
+            delta = deltas[table]
+            delta_state = fe.partial_state(delta[delta[fe.ID_COLUMN].isin(index)], spec)
+            state = fe.merge_states(state, fe.align_state(delta_state, spec, index))
+            for col in state.columns:
+                state_store[col][rows] = state[col].to_numpy()
+                state_store[col].flush()
+            applied.append((state_store, fingerprints[table]))
+        states[table] = state
+
+    history = fe.inf_to_nan(fe.fill_history(pd.concat(
+        [finalize(states[table]) for table, (_, finalize) in TABLES.items()], axis=1)))
+    for col in history_columns(store):
+        store[col][rows] = history[col].to_numpy(dtype=store[col].dtype)
+        store[col].flush()
+
+    # Record the deltas only after their rows are on disk
+    for state_store, fingerprint in applied:
+        manifest = dict(state_store.manifest)
+        manifest['applied_deltas'] = [*manifest.get('applied_deltas', []), fingerprint]
+        _write_manifest(state_store.store_dir, manifest)
+    manifest = dict(store.manifest)
+    manifest['history_refreshed_at'] = time.time()
+    _write_manifest(store_dir, manifest)
+
+    return {
+        'delta_rows': {table: len(frame) for table, frame in deltas.items()},
+        'touched_borrowers': len(touched),
+        'updated_rows': len(rows),
+        'unknown_borrowers': unknown,
+        'seconds': time.perf_counter() - t0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Incrementally refresh bureau / previous-application features.')
+    parser.add_argument('mode', choices=['init', 'refresh'],
+                        help='init: build states from full tables; refresh: apply delta files')
+    parser.add_argument('store_dir', help='Feature store directory (src/feature_store.py)')
+    parser.add_argument('--bureau', default=None, help='bureau CSV/Parquet (full for init, new records for refresh)')
+    parser.add_argument('--prev', default=None, help='previous_application CSV/Parquet')
+    args = parser.parse_args()
+
+    tables = {table: read_delta(path, table)
+              for table, path in (('bureau', args.bureau), ('previous_application', args.prev)) if path}
+    if args.mode == 'init':
+        missing = set(TABLES) - set(tables)
+        if missing:
+            parser.error(f"init needs both tables; missing {', '.join(sorted(missing))}")
+        covered = init_history_state(args.store_dir, tables)
+        print("History state built: " + ", ".join(f"{t} {n:,} borrowers" for t, n in covered.items()))
+        return
+
+    stats = refresh_history_features(args.store_dir, tables)
+    print(f"Refreshed {stats['updated_rows']:,} borrowers from "
+          + ", ".join(f"{n:,} {t} rows" for t, n in stats['delta_rows'].items())
+          + f" in {stats['seconds']:.2f}s ({stats['unknown_borrowers']:,} borrowers not in the store skipped)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,331 @@
+"""
+Schema-declared ingestion of the Home Credit source tables.
+
+``pd.read_csv`` with default inference gives int64/float64 for every number,
+Python-object strings for every enum and loads all columns, used or not
+(``previous_application.csv`` has 37 columns, NB02 needs 10). Each source table
+here has a declared schema: the columns the features need and their dtype.
+
+- integer columns get the smallest integer type that holds their Kaggle range
+  (IDs ``int32``, flags ``int8``, day counts ``int16``/``int32``);
+- string enums (``CREDIT_ACTIVE``, ``CREDIT_TYPE``, ``NAME_CONTRACT_STATUS``,
+  ``ORGANIZATION_TYPE`` ...) are ``category``;
+- money amounts, external scores and every column NB02 aggregates or divides
+  keep ``float64``, so the engineered features are unchanged; columns that pass
+  straight into the model matrix (building statistics, bureau enquiry counts)
+  are ``float32``, the precision XGBoost uses anyway.
+
+Downcasts are checked: a value outside its declared integer type raises instead
+of wrapping around (``read_csv`` with a narrow dtype wraps silently).
+
+The first load converts the CSV, ``CHUNK_ROWS`` at a time, to a Parquet copy in
+the cache directory; later loads read the Parquet file (no CSV parsing; strings
+come back as dictionary-encoded categoricals, never as Python objects). The
+copy records the CSV's (name, mtime, size) and a hash of the schema and is
+rebuilt when either changes. The large behaviour tables (``bureau_balance``,
+installments, POS and credit-card balances) are never loaded whole:
+``iter_table_chunks`` streams them in declared-schema chunks.
+
+Usage:
+    python -m src.ingestion data/raw              # build / refresh the Parquet cache, print memory per table
+    python -m src.ingestion data/raw --compare    # also load with default read_csv for comparison
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pandas.api.types import union_categoricals
+
+from .column_store import _source_signature
+
+CHUNK_ROWS = 100_000
+CACHE_DIR_NAME = 'raw_parquet'
+CATEGORY = 'category'
+
+SOURCE_FILES = {
+    'application': 'application_train.csv',
+    'bureau': 'bureau.csv',
+    'previous_application': 'previous_application.csv',
+}
+# Too large to hold next to the feature build; only ever streamed (src/out_of_core.py)
+STREAMED_SOURCE_FILES = {
+    'bureau_balance': 'bureau_balance.csv',
+    'installments_payments': 'installments_payments.csv',
+    'pos_cash_balance': 'POS_CASH_balance.csv',
+    'credit_card_balance': 'credit_card_balance.csv',
+}
+
+# -----------------------------------------------------------------------------
+# Declared schemas (column -> dtype). Columns not listed are not read.
+# -----------------------------------------------------------------------------
+
+_BUILDING_STATS = [
+    f'{col}_{stat}' for stat in ('AVG', 'MODE', 'MEDI')
+    for col in ('APARTMENTS', 'BASEMENTAREA', 'YEARS_BEGINEXPLUATATION', 'YEARS_BUILD', 'COMMONAREA',
+                'ELEVATORS', 'ENTRANCES', 'FLOORSMAX', 'FLOORSMIN', 'LANDAREA', 'LIVINGAPARTMENTS',
+                'LIVINGAREA', 'NONLIVINGAPARTMENTS', 'NONLIVINGAREA')
+] + ['TOTALAREA_MODE']
+
+# Every application column is a model feature (or the ID / target)
+APPLICATION_SCHEMA = {
+    'SK_ID_CURR': 'int32', 'TARGET': 'int8',
+    **dict.fromkeys(['NAME_CONTRACT_TYPE', 'CODE_GENDER', 'FLAG_OWN_CAR', 'FLAG_OWN_REALTY', 'NAME_TYPE_SUITE',
+                     'NAME_INCOME_TYPE', 'NAME_EDUCATION_TYPE', 'NAME_FAMILY_STATUS', 'NAME_HOUSING_TYPE',
+                     'OCCUPATION_TYPE', 'WEEKDAY_APPR_PROCESS_START', 'ORGANIZATION_TYPE', 'FONDKAPREMONT_MODE',
+                     'HOUSETYPE_MODE', 'WALLSMATERIAL_MODE', 'EMERGENCYSTATE_MODE'], CATEGORY),
+    'CNT_CHILDREN': 'int8',
+    # NB02 ratios and EXT_SOURCE aggregates are computed from these
+    **dict.fromkeys(['AMT_INCOME_TOTAL', 'AMT_CREDIT', 'AMT_ANNUITY', 'AMT_GOODS_PRICE', 'DAYS_REGISTRATION',
+                     'CNT_FAM_MEMBERS', 'EXT_SOURCE_1', 'EXT_SOURCE_2', 'EXT_SOURCE_3'], 'float64'),
+    'DAYS_BIRTH': 'int16', 'DAYS_EMPLOYED': 'int32', 'DAYS_ID_PUBLISH': 'int16',
+    **dict.fromkeys(['FLAG_MOBIL', 'FLAG_EMP_PHONE', 'FLAG_WORK_PHONE', 'FLAG_CONT_MOBILE', 'FLAG_PHONE',
+                     'FLAG_EMAIL', 'REGION_RATING_CLIENT', 'REGION_RATING_CLIENT_W_CITY',
+                     'HOUR_APPR_PROCESS_START', 'REG_REGION_NOT_LIVE_REGION', 'REG_REGION_NOT_WORK_REGION',
+                     'LIVE_REGION_NOT_WORK_REGION', 'REG_CITY_NOT_LIVE_CITY', 'REG_CITY_NOT_WORK_CITY',
+                     'LIVE_CITY_NOT_WORK_CITY'], 'int8'),
+    **{f'FLAG_DOCUMENT_{k}': 'int8' for k in range(2, 22)},
+    **dict.fromkeys(['REGION_POPULATION_RELATIVE', 'OWN_CAR_AGE', *_BUILDING_STATS,
+                     'OBS_30_CNT_SOCIAL_CIRCLE', 'DEF_30_CNT_SOCIAL_CIRCLE', 'OBS_60_CNT_SOCIAL_CIRCLE',
+                     'DEF_60_CNT_SOCIAL_CIRCLE', 'DAYS_LAST_PHONE_CHANGE', 'AMT_REQ_CREDIT_BUREAU_HOUR',
+                     'AMT_REQ_CREDIT_BUREAU_DAY', 'AMT_REQ_CREDIT_BUREAU_WEEK', 'AMT_REQ_CREDIT_BUREAU_MON',
+                     'AMT_REQ_CREDIT_BUREAU_QRT', 'AMT_REQ_CREDIT_BUREAU_YEAR'], 'float32'),
+}
+
+# Columns of the NB02 bureau aggregation (src/feature_engineering.py BUREAU_AGGREGATIONS);
+# SK_ID_BUREAU links bureau_balance months to their applicant
+BUREAU_SCHEMA = {
+    'SK_ID_CURR': 'int32',
+    'SK_ID_BUREAU': 'int32',
+    'CREDIT_ACTIVE': CATEGORY,
+    'CREDIT_TYPE': CATEGORY,
+    'DAYS_CREDIT': 'int16',
+    'DAYS_CREDIT_ENDDATE': 'float64',
+    'DAYS_CREDIT_UPDATE': 'int32',
+    'CREDIT_DAY_OVERDUE': 'int16',
+    'AMT_CREDIT_SUM': 'float64',
+    'AMT_CREDIT_SUM_DEBT': 'float64',
+    'AMT_CREDIT_SUM_OVERDUE': 'float64',
+}
+
+# Columns of the NB02 previous-application aggregation (PREV_AGGREGATIONS)
+PREVIOUS_APPLICATION_SCHEMA = {
+    'SK_ID_CURR': 'int32',
+    'NAME_CONTRACT_TYPE': CATEGORY,
+    'NAME_CONTRACT_STATUS': CATEGORY,
+    'AMT_APPLICATION': 'float64',
+    'AMT_CREDIT': 'float64',
+    'AMT_ANNUITY': 'float64',
+    'AMT_DOWN_PAYMENT': 'float64',
+    'DAYS_DECISION': 'int16',
+    'CNT_PAYMENT': 'float64',
+}
+
+# Behaviour tables (src/out_of_core.py); day offsets are integral, so float32 holds them exactly
+BUREAU_BALANCE_SCHEMA = {
+    'SK_ID_BUREAU': 'int32',
+    'MONTHS_BALANCE': 'int16',
+    'STATUS': CATEGORY,
+}
+INSTALLMENTS_PAYMENTS_SCHEMA = {
+    'SK_ID_CURR': 'int32',
+    'DAYS_INSTALMENT': 'float32',
+    'DAYS_ENTRY_PAYMENT': 'float32',
+    'AMT_INSTALMENT': 'float64',
+    'AMT_PAYMENT': 'float64',
+}
+POS_CASH_BALANCE_SCHEMA = {
+    'SK_ID_CURR': 'int32',
+    'MONTHS_BALANCE': 'int16',
+    'SK_DPD': 'int16',
+    'SK_DPD_DEF': 'int16',
+}
+CREDIT_CARD_BALANCE_SCHEMA = {
+    'SK_ID_CURR': 'int32',
+    'MONTHS_BALANCE': 'int16',
+    'AMT_BALANCE': 'float64',
+    'AMT_CREDIT_LIMIT_ACTUAL': 'float64',
+    'SK_DPD': 'int16',
+    'SK_DPD_DEF': 'int16',
+}
+
+SCHEMAS = {
+    'application': APPLICATION_SCHEMA,
+    'bureau': BUREAU_SCHEMA,
+    'previous_application': PREVIOUS_APPLICATION_SCHEMA,
+    'bureau_balance': BUREAU_BALANCE_SCHEMA,
+    'installments_payments': INSTALLMENTS_PAYMENTS_SCHEMA,
+    'pos_cash_balance': POS_CASH_BALANCE_SCHEMA,
+    'credit_card_balance': CREDIT_CARD_BALANCE_SCHEMA,
+}
+
+
+def schema_fingerprint(table: str) -> str:
+    return hashlib.sha256(json.dumps(SCHEMAS[table], sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _parse_dtype(dtype: str) -> str:
+    """What ``read_csv`` parses a column as before the checked downcast."""
+    if dtype == CATEGORY:
+        return 'str'
+    return 'int64' if dtype.startswith('int') else 'float64'
+
+
+def _downcast(values: pd.Series, dtype: str, table: str) -> pd.Series:
+    """``values`` as ``dtype``; raises if an integer would not round-trip or a float would overflow."""
+    narrow = values.astype(dtype)
+    wide, small = values.to_numpy(), narrow.to_numpy()
+    lossy = (small != wide) if dtype.startswith('int') else (np.isinf(small) & ~np.isinf(wide))
+    if lossy.any():
+        raise ValueError(f"{table}.{values.name}: value {wide[lossy][0]} does not fit the declared {dtype}")
+    return narrow
+
+
+def _read_csv_chunks(csv_path, table: str, chunk_rows: int = CHUNK_ROWS):
+    """Declared-schema chunks of a source CSV (strings still as ``str``)."""
+    schema = SCHEMAS[table]
+    header = pd.read_csv(csv_path, nrows=0).columns
+    missing = [col for col in schema if col not in header]
+    if missing:
+        raise ValueError(f"{Path(csv_path).name} lacks {len(missing)} declared {table} columns, e.g. '{missing[0]}'")
+    parse = {col: _parse_dtype(dtype) for col, dtype in schema.items()}
+    for chunk in pd.read_csv(csv_path, usecols=list(schema), dtype=parse, chunksize=chunk_rows):
+        for col, dtype in schema.items():
+            if dtype not in (CATEGORY, 'float64'):
+                chunk[col] = _downcast(chunk[col], dtype, table)
+        yield chunk
+
+
+def _sorted_categories(df: pd.DataFrame, table: str) -> pd.DataFrame:
+    """Categories in lexical order, as ``pivot_table`` and ``factorize(sort=True)`` order strings."""
+    for col, dtype in SCHEMAS[table].items():
+        if dtype == CATEGORY and col in df.columns:
+            df[col] = df[col].cat.reorder_categories(sorted(df[col].cat.categories))
+    return df
+
+
+def _arrow_schema(table: str, columns) -> pa.Schema:
+    types = {CATEGORY: pa.string()}
+    return pa.schema([(col, types.get(SCHEMAS[table][col]) or pa.from_numpy_dtype(np.dtype(SCHEMAS[table][col])))
+                      for col in columns])
+
+
+def convert_to_parquet(csv_path, parquet_path, table: str, chunk_rows: int = CHUNK_ROWS) -> int:
+    """Stream ``csv_path`` into a declared-schema Parquet file (one row group per chunk); returns rows."""
+    csv_path, parquet_path = Path(csv_path), Path(parquet_path)
+    parquet_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = parquet_path.with_name(parquet_path.name + '.partial')
+    metadata = {'source': json.dumps(_source_signature(csv_path)), 'schema_sha256': schema_fingerprint(table)}
+    writer, n_rows = None, 0
+    try:
+        for chunk in _read_csv_chunks(csv_path, table, chunk_rows):
+            if writer is None:
+                schema = _arrow_schema(table, chunk.columns).with_metadata(metadata)
+                writer = pq.ParquetWriter(tmp, schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            n_rows += len(chunk)
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        tmp.unlink(missing_ok=True)
+        raise
+    writer.close()
+    os.replace(tmp, parquet_path)
+    return n_rows
+
+
+def _is_current(parquet_path: Path, csv_path: Path, table: str) -> bool:
+    if not parquet_path.is_file():
+        return False
+    metadata = pq.read_schema(parquet_path).metadata or {}
+    return (metadata.get(b'schema_sha256', b'').decode() == schema_fingerprint(table)
+            and json.loads(metadata.get(b'source', b'null')) == _source_signature(csv_path))
+
+
+def cached_parquet(data_raw, table: str, cache_dir=None) -> Path:
+    """Path of the Parquet copy of ``table``, (re)building it from the CSV when missing or stale."""
+    data_raw = Path(data_raw)
+    csv_path = data_raw / {**SOURCE_FILES, **STREAMED_SOURCE_FILES}[table]
+    cache_dir = Path(cache_dir) if cache_dir else data_raw.parent / 'processed' / CACHE_DIR_NAME
+    parquet_path = cache_dir / f'{table}.parquet'
+    if not _is_current(parquet_path, csv_path, table):
+        convert_to_parquet(csv_path, parquet_path, table)
+    return parquet_path
+
+
+def read_table(path, table: str, columns: list = None) -> pd.DataFrame:
+    """
+    A source table with its declared dtypes, from a Parquet copy or directly
+    from a CSV (e.g. a delta file). ``columns`` narrows the declared columns.
+    """
+    path = Path(path)
+    schema = SCHEMAS[table]
+    if path.suffix.lower() == '.parquet':
+        available = pq.read_schema(path).names
+        wanted = [col for col in available if col in schema and (columns is None or col in columns)]
+        categorical = [col for col in wanted if schema[col] == CATEGORY]
+        df = pq.read_table(path, columns=wanted, read_dictionary=categorical).to_pandas()
+    else:
+        chunks = [chunk if columns is None else chunk[[c for c in chunk.columns if c in columns]]
+                  for chunk in _read_csv_chunks(path, table)]
+        data = {}
+        for col in chunks[0].columns:
+            if schema[col] == CATEGORY:
+                data[col] = pd.Series(union_categoricals([c[col].astype(CATEGORY) for c in chunks]), name=col)
+            else:
+                data[col] = pd.Series(np.concatenate([c[col].to_numpy() for c in chunks]), name=col)
+        df = pd.DataFrame(data)
+    return _sorted_categories(df, table)
+
+
+def iter_table_chunks(path, table: str, chunk_rows: int = CHUNK_ROWS):
+    """Declared-schema DataFrames of at most ``chunk_rows`` rows from a Parquet copy or a CSV."""
+    path = Path(path)
+    if path.suffix.lower() != '.parquet':
+        yield from _read_csv_chunks(path, table, chunk_rows)
+        return
+    parquet = pq.ParquetFile(path)
+    wanted = [col for col in parquet.schema_arrow.names if col in SCHEMAS[table]]
+    for batch in parquet.iter_batches(batch_size=chunk_rows, columns=wanted):
+        yield batch.to_pandas()
+
+
+def load_table(data_raw, table: str, columns: list = None, cache_dir=None) -> pd.DataFrame:
+    """``table`` from ``data_raw`` with declared dtypes, via the cached Parquet copy."""
+    return read_table(cached_parquet(data_raw, table, cache_dir), table, columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the declared-schema Parquet copies of the source tables.')
+    parser.add_argument('data_raw', help='Directory with ' + ', '.join(SOURCE_FILES.values()))
+    parser.add_argument('--cache-dir', default=None, help=f'Default: <data_raw>/../processed/{CACHE_DIR_NAME}')
+    parser.add_argument('--compare', action='store_true', help='Also load each CSV with default read_csv')
+    args = parser.parse_args()
+
+    for table, file_name in SOURCE_FILES.items():
+        t0 = time.perf_counter()
+        path = cached_parquet(args.data_raw, table, args.cache_dir)
+        t_cache = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        df = read_table(path, table)
+        t_load = time.perf_counter() - t0
+        line = (f"{table}: {len(df):,} rows x {df.shape[1]} columns, {df.memory_usage(deep=True).sum() / 1e6:,.0f} MB "
+                f"in memory | cache {t_cache:.2f}s, load {t_load:.2f}s")
+        if args.compare:
+            t0 = time.perf_counter()
+            default = pd.read_csv(Path(args.data_raw) / file_name)
+            line += (f" | read_csv: {default.shape[1]} columns, "
+                     f"{default.memory_usage(deep=True).sum() / 1e6:,.0f} MB, {time.perf_counter() - t0:.2f}s")
+            del default
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
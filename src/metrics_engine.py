@@ -0,0 +1,114 @@
+"""
+Threshold-independent discrimination metrics for a scored portfolio.
+
+ROC and PR curves, AUC-ROC, Gini, KS, average precision, PR-AUC and Brier score
+all come out of one descending sort of the PDs. Results are memoized in a
+process-wide cache keyed on a fingerprint of (scores, labels, model version), so
+every dashboard session and tab reuses one computation until the data or the
+model changes.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .chart_data import decimate_curve
+
+_CACHE_SIZE = 8
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def data_fingerprint(scores: np.ndarray, labels: np.ndarray, model_version: str = '') -> str:
+    """blake2b digest of the score and label buffers plus the model version."""
+    h = hashlib.blake2b(digest_size=16)
+    for arr in (scores, labels):
+        arr = np.ascontiguousarray(arr)
+        h.update(str(arr.dtype).encode())
+        h.update(arr.tobytes())
+    h.update(str(model_version).encode())
+    return h.hexdigest()
+
+
+def compute_discrimination_metrics(scores: np.ndarray, labels: np.ndarray,
+                                   max_curve_points: int = 500) -> dict:
+    """
+    Compute all threshold-independent metrics in a single sorted pass.
+
+    Curves follow sklearn's ``roc_curve`` / ``precision_recall_curve``
+    conventions (one point per distinct score), so AUC matches
+    ``roc_auc_score`` and average precision matches ``average_precision_score``.
+
+    Returns a dict with scalar metrics and ``roc`` / ``pr`` curves already
+    LTTB-decimated to at most ``max_curve_points`` points for plotting.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    labels = np.asarray(labels, dtype=np.float64)
+
+    order = np.argsort(-scores, kind='mergesort')
+    s = scores[order]
+    y = labels[order]
+
+    # Last index of each run of tied scores = one curve point per distinct threshold
+    distinct = np.flatnonzero(np.diff(s))
+    ends = np.concatenate((distinct, [len(s) - 1]))
+    tps = np.cumsum(y)[ends]
+    fps = (ends + 1) - tps
+
+    n_pos, n_neg = tps[-1], fps[-1]
+    tpr = np.concatenate(([0.0], tps / n_pos)) if n_pos > 0 else np.zeros(len(tps) + 1)
+    fpr = np.concatenate(([0.0], fps / n_neg)) if n_neg > 0 else np.zeros(len(fps) + 1)
+    thresholds = np.concatenate(([np.inf], s[ends]))
+
+    auc_roc = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+    ks_idx = int(np.argmax(tpr - fpr))
+
+    precision = tps / (tps + fps)
+    recall = tpr[1:]
+    average_precision = float(np.sum(np.diff(np.concatenate(([0.0], recall))) * precision))
+    # PR curve in sklearn order: recall decreasing, ending at (recall=0, precision=1)
+    pr_recall = np.concatenate((recall[::-1], [0.0]))
+    pr_precision = np.concatenate((precision[::-1], [1.0]))
+    pr_auc = float(-np.sum(np.diff(pr_recall) * (pr_precision[1:] + pr_precision[:-1]) / 2))
+
+    roc_x, roc_y = decimate_curve(fpr, tpr, max_curve_points)
+    pr_x, pr_y = decimate_curve(pr_recall, pr_precision, max_curve_points)
+
+    return {
+        'n': len(scores),
+        'n_defaults': int(n_pos),
+        'auc_roc': auc_roc,
+        'gini': 2 * auc_roc - 1,
+        'ks': float(tpr[ks_idx] - fpr[ks_idx]),
+        'ks_threshold': float(thresholds[ks_idx]),
+        'average_precision': average_precision,
+        'pr_auc': pr_auc,
+        'brier_score': float(np.mean((scores - labels) ** 2)),
+        'roc': {'fpr': roc_x, 'tpr': roc_y},
+        'pr': {'recall': pr_x, 'precision': pr_y},
+    }
+
+
+def get_discrimination_metrics(scores: np.ndarray, labels: np.ndarray, model_version: str = '',
+                               max_curve_points: int = 500) -> dict:
+    """
+    Memoized ``compute_discrimination_metrics``.
+
+    The cache is shared by every thread in the process (all Streamlit sessions)
+    and holds the most recent ``_CACHE_SIZE`` datasets.
+    """
+    key = (data_fingerprint(scores, labels, model_version), max_curve_points)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    metrics = compute_discrimination_metrics(scores, labels, max_curve_points)
+
+    with _cache_lock:
+        _cache[key] = metrics
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return metrics
@@ -0,0 +1,301 @@
+"""
+Out-of-core behaviour features from the large Home Credit tables.
+
+``bureau_balance`` (~27M rows), ``installments_payments`` (~13.6M),
+``POS_CASH_balance`` (~10M) and ``credit_card_balance`` (~3.8M) never fit next
+to the NB02 build, so they were left out. Here each table is streamed in
+chunks of ``chunk_rows`` (``src/ingestion.py``; the cached Parquet copy when
+present). Every chunk is reduced to the mergeable partial state of
+``src/feature_engineering.py`` (row counts and per column sum, non-missing
+count, min and max) per ``SK_ID_CURR``. That state is folded into dense arrays
+aligned with the feature-store rows. Memory use is one chunk plus one state row
+per applicant, however many rows the table has. Loan-level keys are resolved on
+the way: ``bureau_balance`` months reach their applicant through
+``bureau.SK_ID_BUREAU``, and installment, POS and card rows carry ``SK_ID_CURR``.
+
+Only records dated before the application are used (DECISION-022): months with
+``MONTHS_BALANCE < 0`` and instalments due before it. A payment entered on or after the
+application day counts as missing.
+
+The finished features (days-past-due maxima, late-payment counts and ratios,
+30+ DPD counts, payment and utilization ratios; ``BB_*``, ``INST_*``, ``POS_*``,
+``CC_*``) are added to the feature store as non-model columns. Counts are 0 and
+ratios/maxima NaN for applicants without records. Run it while no scoring run
+reads the store.
+
+Usage:
+    python -m src.out_of_core data/processed/feature_store data/raw
+    python -m src.out_of_core data/processed/feature_store data/raw --tables installments_payments --chunk-rows 250000
+"""
+
+import argparse
+import time
+import tracemalloc
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from . import feature_engineering as fe
+from .feature_store import FeatureStore, add_store_columns
+from .ingestion import STREAMED_SOURCE_FILES, cached_parquet, iter_table_chunks, load_table
+
+CHUNK_ROWS = 500_000
+RECENT_MONTHS = 12
+DPD_SEVERE = 30
+BEHAVIOUR_PREFIXES = ('BB_', 'INST_', 'POS_', 'CC_')
+
+
+# =============================================================================
+# Per-chunk preparation: one numeric column per aggregated quantity
+# =============================================================================
+#
+# Indicator columns are 1.0 / 0.0, and NaN where the record says nothing (e.g. a
+# bureau month with status 'X'), so SUM is the count and SUM / N the ratio.
+
+def _indicator(condition: pd.Series, known: pd.Series) -> np.ndarray:
+    return np.where(known, condition.astype(np.float64), np.nan)
+
+
+def _prepare_bureau_balance(chunk: pd.DataFrame, bureau_owner: pd.Series) -> pd.DataFrame:
+    """Monthly bureau status -> DPD bucket (0 = current, 1 = 1-30 DPD ... 5 = 120+ DPD or written off)."""
+    chunk = chunk[chunk['MONTHS_BALANCE'] < 0]
+    owner = bureau_owner.reindex(chunk['SK_ID_BUREAU'].to_numpy()).to_numpy()
+    known_owner = ~np.isnan(owner)
+    chunk, owner = chunk[known_owner], owner[known_owner]
+    # 'C' (closed) and 'X' (unknown) carry no DPD information
+    # Parse the handful of STATUS categories, not every row
+    status = chunk['STATUS'].astype('category').cat
+    levels = pd.to_numeric(status.categories.astype(str), errors='coerce').to_numpy(np.float64)
+    codes = status.codes.to_numpy()
+    bucket = pd.Series(np.where(codes >= 0, levels[codes], np.nan), index=chunk.index)
+    known = bucket.notna()
+    recent = chunk['MONTHS_BALANCE'] >= -RECENT_MONTHS
+    return pd.DataFrame({
+        fe.ID_COLUMN: owner.astype(np.int64),
+        'DPD_BUCKET': bucket.to_numpy(),
+        'LATE': _indicator(bucket > 0, known),
+        'DPD30': _indicator(bucket >= 2, known),
+        'LATE_RECENT': _indicator(bucket > 0, known & recent),
+    })
+
+
+def _prepare_installments(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Instalments due before the application; DPD = days the payment came after the due date."""
+    chunk = chunk[chunk['DAYS_INSTALMENT'] < 0]
+    entry = chunk['DAYS_ENTRY_PAYMENT'].where(chunk['DAYS_ENTRY_PAYMENT'] < 0)
+    dpd = (entry - chunk['DAYS_INSTALMENT']).clip(lower=0).astype(np.float64)
+    paid = dpd.notna()
+    both = paid & chunk['AMT_INSTALMENT'].notna()
+    return pd.DataFrame({
+        fe.ID_COLUMN: chunk[fe.ID_COLUMN].to_numpy(np.int64),
+        'DPD': dpd.to_numpy(),
+        'LATE': _indicator(dpd > 0, paid),
+        'DPD30': _indicator(dpd > DPD_SEVERE, paid),
+        'UNDERPAID': _indicator(chunk['AMT_PAYMENT'] < chunk['AMT_INSTALMENT'], both),
+        'AMT_INSTALMENT': chunk['AMT_INSTALMENT'].where(both).to_numpy(),
+        'AMT_PAYMENT': chunk['AMT_PAYMENT'].where(both).to_numpy(),
+    })
+
+
+def _prepare_monthly_dpd(chunk: pd.DataFrame, amounts=()) -> pd.DataFrame:
+    """POS / credit-card months before the application with their SK_DPD / SK_DPD_DEF."""
+    chunk = chunk[chunk['MONTHS_BALANCE'] < 0]
+    known = pd.Series(True, index=chunk.index)
+    recent = chunk['MONTHS_BALANCE'] >= -RECENT_MONTHS
+    return pd.DataFrame({
+        fe.ID_COLUMN: chunk[fe.ID_COLUMN].to_numpy(np.int64),
+        'SK_DPD': chunk['SK_DPD'].to_numpy(np.float64),
+        'SK_DPD_DEF': chunk['SK_DPD_DEF'].to_numpy(np.float64),
+        'LATE': _indicator(chunk['SK_DPD'] > 0, known),
+        'DPD30': _indicator(chunk['SK_DPD'] > DPD_SEVERE, known),
+        'LATE_RECENT': _indicator(chunk['SK_DPD'] > 0, recent),
+        **{col: chunk[col].to_numpy(np.float64) for col in amounts},
+    })
+
+
+def _ratio(numerator: pd.Series, denominator: pd.Series) -> pd.Series:
+    return (numerator / denominator).where(denominator > 0)
+
+
+# =============================================================================
+# Finalization: partial state -> features
+# =============================================================================
+
+def _bureau_balance_features(state: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame({
+        'BB_MONTHS': state['ROWS'],
+        'BB_STATUS_MAX': state['DPD_BUCKET__MAX'],
+        'BB_LATE_MONTHS': state['LATE__SUM'],
+        'BB_LATE_RATIO': _ratio(state['LATE__SUM'], state['LATE__N']),
+        'BB_DPD30_MONTHS': state['DPD30__SUM'],
+        'BB_LATE_RATIO_12M': _ratio(state['LATE_RECENT__SUM'], state['LATE_RECENT__N']),
+    })
+
+
+def _installments_features(state: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame({
+        'INST_COUNT': state['ROWS'],
+        'INST_DPD_MAX': state['DPD__MAX'],
+        'INST_DPD_MEAN': _ratio(state['DPD__SUM'], state['DPD__N']),
+        'INST_LATE_COUNT': state['LATE__SUM'],
+        'INST_LATE_RATIO': _ratio(state['LATE__SUM'], state['LATE__N']),
+        'INST_DPD30_COUNT': state['DPD30__SUM'],
+        'INST_UNDERPAID_RATIO': _ratio(state['UNDERPAID__SUM'], state['UNDERPAID__N']),
+        'INST_PAYMENT_RATIO': _ratio(state['AMT_PAYMENT__SUM'], state['AMT_INSTALMENT__SUM']),
+    })
+
+
+def _monthly_dpd_features(state: pd.DataFrame, prefix: str) -> dict:
+    return {
+        f'{prefix}_MONTHS': state['ROWS'],
+        f'{prefix}_DPD_MAX': state['SK_DPD__MAX'],
+        f'{prefix}_DPD_DEF_MAX': state['SK_DPD_DEF__MAX'],
+        f'{prefix}_LATE_RATIO': _ratio(state['LATE__SUM'], state['LATE__N']),
+        f'{prefix}_DPD30_MONTHS': state['DPD30__SUM'],
+        f'{prefix}_LATE_RATIO_12M': _ratio(state['LATE_RECENT__SUM'], state['LATE_RECENT__N']),
+    }
+
+
+def _pos_features(state: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame(_monthly_dpd_features(state, 'POS'))
+
+
+def _credit_card_features(state: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame({
+        **_monthly_dpd_features(state, 'CC'),
+        'CC_BALANCE_MAX': state['AMT_BALANCE__MAX'],
+        'CC_UTILIZATION': _ratio(state['AMT_BALANCE__SUM'], state['AMT_CREDIT_LIMIT_ACTUAL__SUM']),
+    })
+
+
+def _spec(numeric: list) -> dict:
+    return {'numeric': numeric, 'flags': {}, 'levels': []}
+
+
+_MONTHLY = ['SK_DPD', 'SK_DPD_DEF', 'LATE', 'DPD30', 'LATE_RECENT']
+
+# table -> (prepare(chunk, **context), partial-state spec, finalize(state))
+TABLES = {
+    'bureau_balance': (_prepare_bureau_balance, _spec(['DPD_BUCKET', 'LATE', 'DPD30', 'LATE_RECENT']),
+                       _bureau_balance_features),
+    'installments_payments': (_prepare_installments,
+                              _spec(['DPD', 'LATE', 'DPD30', 'UNDERPAID', 'AMT_INSTALMENT', 'AMT_PAYMENT']),
+                              _installments_features),
+    'pos_cash_balance': (_prepare_monthly_dpd, _spec(_MONTHLY), _pos_features),
+    'credit_card_balance': (partial(_prepare_monthly_dpd, amounts=('AMT_BALANCE', 'AMT_CREDIT_LIMIT_ACTUAL')),
+                            _spec(_MONTHLY + ['AMT_BALANCE', 'AMT_CREDIT_LIMIT_ACTUAL']), _credit_card_features),
+}
+
+
+# =============================================================================
+# Streaming aggregation
+# =============================================================================
+
+class DenseState:
+    """Partial state of a fixed set of applicants, as one array per state column."""
+
+    def __init__(self, spec: dict, ids: np.ndarray):
+        self.spec = spec
+        self.index = pd.Index(ids, name=fe.ID_COLUMN)
+        empty = fe.empty_state(spec, self.index)
+        self.arrays = {col: empty[col].to_numpy().copy() for col in empty.columns}
+        self.unknown_ids = set()
+
+    def merge(self, state: pd.DataFrame):
+        """Fold a chunk's partial state in; applicants outside ``ids`` are counted and skipped."""
+        rows = self.index.get_indexer(state.index)
+        known = rows >= 0
+        self.unknown_ids.update(state.index[~known].tolist())
+        rows, state = rows[known], state[known]
+        current = pd.DataFrame({col: values[rows] for col, values in self.arrays.items()}, index=state.index)
+        merged = fe.merge_states(current, state)
+        for col, values in self.arrays.items():
+            values[rows] = merged[col].to_numpy()
+
+    def frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.arrays, index=self.index)
+
+
+def aggregate_table(chunks, table: str, ids: np.ndarray, **context) -> tuple:
+    """
+    Stream ``chunks`` of ``table`` into per-applicant features for ``ids`` (in that
+    order). Returns ``(features, stats)``.
+    """
+    prepare, spec, finalize = TABLES[table]
+    state = DenseState(spec, ids)
+    n_rows = n_used = 0
+    for chunk in chunks:
+        n_rows += len(chunk)
+        prepared = prepare(chunk, **context)
+        n_used += len(prepared)
+        if len(prepared):
+            state.merge(fe.partial_state(prepared, spec))
+    features = fe.inf_to_nan(finalize(state.frame()))
+    stats = {'rows': n_rows, 'rows_used': n_used, 'unknown_applicants': len(state.unknown_ids),
+             'applicants_with_records': int((state.arrays['ROWS'] > 0).sum())}
+    return features, stats
+
+
+def bureau_owner(data_raw, cache_dir=None) -> pd.Series:
+    """``SK_ID_CURR`` of every ``SK_ID_BUREAU`` (bureau_balance rows carry only the latter)."""
+    bureau = load_table(data_raw, 'bureau', columns=['SK_ID_BUREAU', fe.ID_COLUMN], cache_dir=cache_dir)
+    return pd.Series(bureau[fe.ID_COLUMN].to_numpy(np.float64), index=bureau['SK_ID_BUREAU'].to_numpy())
+
+
+def add_behaviour_features(store_dir, data_raw, tables=None, chunk_rows: int = CHUNK_ROWS,
+                           cache_dir=None, use_cache: bool = True) -> dict:
+    """
+    Aggregate the behaviour ``tables`` (default: all found in ``data_raw``) and add
+    their features to the feature store. Returns per-table stats, including
+    seconds and peak traced MB.
+    """
+    data_raw = Path(data_raw)
+    ids = FeatureStore(store_dir).ids()
+    tables = [t for t in TABLES if (data_raw / STREAMED_SOURCE_FILES[t]).is_file()] if tables is None else tables
+    report = {}
+    for table in tables:
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        try:
+            source = cached_parquet(data_raw, table, cache_dir) if use_cache else data_raw / STREAMED_SOURCE_FILES[table]
+            context = {'bureau_owner': bureau_owner(data_raw, cache_dir)} if table == 'bureau_balance' else {}
+            features, stats = aggregate_table(iter_table_chunks(source, table, chunk_rows), table, ids, **context)
+            add_store_columns(store_dir, {col: features[col].to_numpy() for col in features.columns})
+            stats['peak_mb'] = tracemalloc.get_traced_memory()[1] / 1e6
+        finally:
+            tracemalloc.stop()
+        stats.update(seconds=time.perf_counter() - t0, columns=list(features.columns))
+        report[table] = stats
+    return report
+
+
+def behaviour_features(store_dir) -> pd.DataFrame:
+    """The behaviour columns present in the feature store, indexed by ``SK_ID_CURR`` (empty if none)."""
+    store = FeatureStore(store_dir)
+    columns = [col for col in store.columns if col.startswith(BEHAVIOUR_PREFIXES)]
+    return store.to_frame(columns).set_axis(pd.Index(store.ids(), name=fe.ID_COLUMN))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Add streamed behaviour features (DPD, late payments) to the feature store.')
+    parser.add_argument('store_dir', help='Feature store directory (src/feature_store.py)')
+    parser.add_argument('data_raw', help='Directory with ' + ', '.join(STREAMED_SOURCE_FILES.values()))
+    parser.add_argument('--tables', nargs='+', choices=list(TABLES), default=None)
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='Rows per chunk (sets the memory ceiling)')
+    parser.add_argument('--cache-dir', default=None, help='Parquet copies of the source tables (src/ingestion.py)')
+    parser.add_argument('--no-cache', action='store_true', help='Stream the CSVs without writing Parquet copies')
+    args = parser.parse_args()
+
+    report = add_behaviour_features(args.store_dir, args.data_raw, args.tables, args.chunk_rows,
+                                    args.cache_dir, use_cache=not args.no_cache)
+    for table, stats in report.items():
+        print(f"{table}: {stats['rows']:,} rows ({stats['rows_used']:,} before application) -> "
+              f"{stats['applicants_with_records']:,} applicants, {len(stats['columns'])} columns | "
+              f"{stats['seconds']:.1f}s, peak {stats['peak_mb']:,.0f} MB traced | "
+              f"{stats['unknown_applicants']:,} applicants not in the store skipped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Chunked export of flagged loans (PD >= threshold) from a column store.
+
+Rows are masked and serialized one chunk at a time, so neither the full
+portfolio DataFrame nor the full CSV text is ever held at once. Large flagged
+sets can be exported as gzip-compressed CSV or Parquet instead of plain CSV.
+"""
+
+import gzip
+import io
+
+import numpy as np
+
+# label -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    'CSV': ('.csv', 'text/csv'),
+    'CSV (gzip)': ('.csv.gz', 'application/gzip'),
+    'Parquet': ('.parquet', 'application/vnd.apache.parquet'),
+}
+
+
+def _flagged_chunks(store, threshold: float, columns: list, chunk_rows: int):
+    """Yield DataFrames of flagged rows, in portfolio order, ``chunk_rows`` source rows at a time."""
+    scores = store['predicted_pd']
+    for start in range(0, len(store), chunk_rows):
+        stop = min(start + chunk_rows, len(store))
+        mask = np.asarray(scores[start:stop]) >= threshold
+        if mask.any():
+            yield store.to_frame(columns, rows=np.flatnonzero(mask) + start)
+
+
+def export_flagged(store, threshold: float, columns: list, fmt: str = 'CSV',
+                   chunk_rows: int = 100_000) -> bytes:
+    """Serialize the loans with PD >= ``threshold`` in one of ``EXPORT_FORMATS``."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'; expected one of {list(EXPORT_FORMATS)}")
+
+    buffer = io.BytesIO()
+    chunks = _flagged_chunks(store, threshold, columns, chunk_rows)
+
+    if fmt == 'Parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(buffer, table.schema, compression='snappy')
+            writer.write_table(table)
+        if writer is None:
+            empty = store.to_frame(columns, rows=slice(0, 0))
+            pq.write_table(pa.Table.from_pandas(empty, preserve_index=False), buffer)
+        else:
+            writer.close()
+        return buffer.getvalue()
+
+    if fmt == 'CSV (gzip)':
+        raw = gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0)
+    else:
+        raw = buffer
+    text = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+
+    header = True
+    for chunk in chunks:
+        chunk.to_csv(text, index=False, header=header)
+        header = False
+    if header:
+        text.write(','.join(columns) + '\n')
+
+    text.flush()
+    text.detach()
+    if raw is not buffer:
+        raw.close()
+    return buffer.getvalue()
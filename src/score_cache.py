@@ -0,0 +1,193 @@
+"""
+Persistent PD score cache for surveillance and batch scoring runs.
+
+Scores are stored in SQLite keyed on (model version, calibrator version,
+SK_ID_CURR, feature-row hash). The row hash is ``pd.util.hash_pandas_object``
+over the borrower's model features in ``feature_names`` order, so a borrower is
+re-scored only when one of their features changes or when the model or the
+calibrator is retrained. Lookups go through a temporary probe table joined on
+the primary key, one query per chunk, and never load the whole cache.
+
+Hit/miss counts are kept per cache instance so callers can report hit rates.
+Runs end with ``prune()``, which drops entries of other model/calibrator
+versions so the file holds one version of the book.
+
+Usage:
+    cache = ScoreCache(DATA_PROCESSED / 'pd_score_cache.db', *artifact_versions(MODELS_DIR))
+    scores = cache.score(df, score_fn, feature_names)      # DataFrame: pd_raw, pd_score
+    print(cache.summary())
+    cache.prune()                                           # drop other model/calibrator versions
+"""
+
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .tree_export import file_sha256
+
+ID_COLUMN = 'SK_ID_CURR'
+UNCALIBRATED = 'none'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS pd_scores (
+    model_version      TEXT    NOT NULL,
+    calibrator_version TEXT    NOT NULL,
+    sk_id_curr         INTEGER NOT NULL,
+    row_hash           INTEGER NOT NULL,
+    pd_raw             REAL    NOT NULL,
+    pd_score           REAL    NOT NULL,
+    scored_at          REAL    NOT NULL,
+    PRIMARY KEY (model_version, calibrator_version, sk_id_curr, row_hash)
+) WITHOUT ROWID
+'''
+
+
+def row_hashes(frame, columns: list = None) -> np.ndarray:
+    """
+    uint64 hash of each row over ``columns`` (in that order; absent columns are
+    skipped), or over every column of ``frame`` (a DataFrame or 2-D array).
+    """
+    if isinstance(frame, np.ndarray):
+        frame = pd.DataFrame(frame, copy=False)
+    if columns is not None:
+        frame = frame[[c for c in columns if c in frame.columns]]
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+def artifact_versions(models_dir, calibrated: bool = True) -> tuple:
+    """
+    (model_version, calibrator_version) for the artifacts in ``models_dir``.
+
+    The model version combines the model-card version with the first 16 hex
+    digits of the model file's SHA-256, so a retrain invalidates the cache even
+    if nobody bumps the card. The calibrator version hashes the table that is
+    actually applied (``calibration_table.json``), so recompiling or editing it
+    invalidates cached PDs too. ``calibrated=False`` is for callers that cache raw
+    ``predict_proba`` output.
+    """
+    models_dir = Path(models_dir)
+    card_version = ''
+    card_path = models_dir / 'model_card.json'
+    if card_path.exists():
+        with open(card_path, encoding='utf-8') as f:
+            card_version = json.load(f).get('model_metadata', {}).get('model_version', '')
+    model_version = f"{card_version}+{file_sha256(models_dir / 'xgb_credit_model.pkl')[:16]}"
+    if not calibrated:
+        return model_version, UNCALIBRATED
+    return model_version, file_sha256(models_dir / 'calibration_table.json')[:16]
+
+
+class ScoreCache:
+    """SQLite-backed (id, feature hash, model, calibrator) -> (raw PD, calibrated PD) cache."""
+
+    def __init__(self, path, model_version: str, calibrator_version: str = UNCALIBRATED):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.model_version = model_version
+        self.calibrator_version = calibrator_version
+        self.hits = 0
+        self.misses = 0
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(_SCHEMA)
+        self._conn.execute('CREATE TEMP TABLE IF NOT EXISTS probe '
+                           '(pos INTEGER PRIMARY KEY, sk_id_curr INTEGER NOT NULL, row_hash INTEGER NOT NULL)')
+        self._conn.commit()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self) -> dict:
+        return {'lookups': self.hits + self.misses, 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': round(self.hit_rate, 4)}
+
+    def lookup(self, ids, hashes) -> tuple:
+        """(hit mask, pd_raw, pd_score) for each (id, hash); scores are NaN where missing. Counts hits/misses."""
+        ids = np.asarray(ids, dtype=np.int64)
+        signed = np.asarray(hashes, dtype=np.uint64).view(np.int64)
+        pd_raw = np.full(len(ids), np.nan)
+        pd_score = np.full(len(ids), np.nan)
+
+        conn = self._conn
+        conn.execute('DELETE FROM probe')
+        conn.executemany('INSERT INTO probe VALUES (?, ?, ?)',
+                         zip(range(len(ids)), ids.tolist(), signed.tolist()))
+        rows = conn.execute(
+            'SELECT p.pos, s.pd_raw, s.pd_score FROM probe p JOIN pd_scores s '
+            'ON s.model_version = ? AND s.calibrator_version = ? '
+            'AND s.sk_id_curr = p.sk_id_curr AND s.row_hash = p.row_hash',
+            (self.model_version, self.calibrator_version),
+        ).fetchall()
+        if rows:
+            found = np.array(rows, dtype=np.float64)
+            pos = found[:, 0].astype(np.int64)
+            pd_raw[pos], pd_score[pos] = found[:, 1], found[:, 2]
+        hit = ~np.isnan(pd_score)
+        self.hits += int(hit.sum())
+        self.misses += len(hit) - int(hit.sum())
+        return hit, pd_raw, pd_score
+
+    def store(self, ids, hashes, pd_raw, pd_score):
+        ids = np.asarray(ids, dtype=np.int64)
+        signed = np.asarray(hashes, dtype=np.uint64).view(np.int64)
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO pd_scores VALUES (?, ?, ?, ?, ?, ?, ?)',
+                ((self.model_version, self.calibrator_version, i, h, float(r), float(s), now)
+                 for i, h, r, s in zip(ids.tolist(), signed.tolist(), pd_raw, pd_score)),
+            )
+
+    def score(self, frame: pd.DataFrame, score_fn, feature_columns: list, id_column: str = ID_COLUMN,
+              hashes: np.ndarray = None) -> pd.DataFrame:
+        """
+        ``pd_raw`` / ``pd_score`` for every row of ``frame``, scoring only cache misses.
+
+        ``score_fn(misses)`` receives the missed rows as a DataFrame and returns
+        ``(pd_raw, pd_score)`` arrays (pass the same array twice when uncalibrated).
+        """
+        if id_column not in frame.columns:
+            raise ValueError(f"Score cache needs an '{id_column}' column")
+        if hashes is None:
+            hashes = row_hashes(frame, feature_columns)
+        ids = frame[id_column].to_numpy()
+        hit, pd_raw, pd_score = self.lookup(ids, hashes)
+
+        miss = np.flatnonzero(~hit)
+        if len(miss):
+            raw, calibrated = score_fn(frame.iloc[miss])
+            pd_raw[miss], pd_score[miss] = raw, calibrated
+            self.store(ids[miss], hashes[miss], pd_raw[miss], pd_score[miss])
+        return pd.DataFrame({'pd_raw': pd_raw, 'pd_score': pd_score}, index=frame.index)
+
+    def prune(self, max_age_days: float = None) -> int:
+        """
+        Delete entries from other model/calibrator versions and, with
+        ``max_age_days``, entries scored longer ago than that. Returns rows deleted.
+        """
+        with self._conn:
+            deleted = self._conn.execute(
+                'DELETE FROM pd_scores WHERE model_version != ? OR calibrator_version != ?',
+                (self.model_version, self.calibrator_version),
+            ).rowcount
+            if max_age_days is not None:
+                deleted += self._conn.execute(
+                    'DELETE FROM pd_scores WHERE scored_at < ?', (time.time() - max_age_days * 86400,),
+                ).rowcount
+        return deleted
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
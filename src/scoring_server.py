@@ -0,0 +1,508 @@
+"""
+Local HTTP scoring service with asyncio micro-batching.
+
+Each ``POST /score`` carries one application (the calculator inputs). Its
+feature vector is built on arrival from the precompiled ``ScoringTemplate``, and
+the request joins a queue. ``MicroBatcher`` drains the queue into batches of up
+to ``max_batch_size`` rows, waiting at most ``max_wait_ms`` after the first
+request of a batch, and scores each batch with a single predict call on a
+worker thread, so the event loop keeps accepting requests while a batch runs.
+Every caller gets back its calibrated PD, the ``model_card.json`` risk band and
+ECL (AMT_CREDIT x PD x LGD).
+
+Endpoints:
+    POST /score    {"EXT_SOURCE": 0.5, "AGE_YEARS": 35, "AMT_CREDIT": 200000,
+                    "AMT_ANNUITY": 5000, "AMT_INCOME_TOTAL": 150000 (optional),
+                    "SK_ID_CURR": 100002 (optional)}
+    GET  /metrics  Prometheus text: request/batch counters, queue depth, batch-size
+                   and latency histograms
+    GET  /health   model version, queue depth and p99 latency bucket
+
+HTTP/1.1 with keep-alive is served with the standard library only (no web
+framework dependency).
+
+Usage:
+    python -m src.scoring_server --port 8080 --max-batch-size 64 --max-wait-ms 2
+    python -m src.scoring_server --load-test --requests 5000 --concurrency 64 --slo-ms 50
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import warnings
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from .application_scoring import CALCULATOR_INPUTS, ID_COLUMN, ScoringTemplate
+from .calibration import load_current_table
+
+MODELS_PATH = Path(__file__).resolve().parent.parent / 'models'
+LGD = 0.60  # Loss Given Default (Basel IRB foundation, unsecured consumer; NB03 §6.1)
+MAX_BATCH_SIZE = 64
+MAX_WAIT_MS = 2.0
+MAX_BODY_BYTES = 64 * 1024
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+# =============================================================================
+# Metrics
+# =============================================================================
+
+class Histogram:
+    """Cumulative-bucket histogram rendered in Prometheus text format."""
+
+    def __init__(self, name: str, help_text: str, buckets: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Upper bucket bound containing the ``q`` quantile (``inf`` if beyond the last bucket)."""
+        if self.count == 0:
+            return 0.0
+        target, running = q * self.count, 0
+        for bound, n in zip(self.buckets, self.counts):
+            running += n
+            if running >= target:
+                return bound
+        return float('inf')
+
+    def render(self) -> list:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        running = 0
+        for bound, n in zip(self.buckets, self.counts):
+            running += n
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {running}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f'{self.name}_sum {self.sum}')
+        lines.append(f'{self.name}_count {self.count}')
+        return lines
+
+
+class ServerMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batch_size = Histogram('crews_batch_size', 'Rows per scored micro-batch', BATCH_SIZE_BUCKETS)
+        self.latency = Histogram('crews_request_latency_seconds',
+                                 'Queue wait + scoring time per request', LATENCY_BUCKETS)
+        self.predict_time = Histogram('crews_batch_predict_seconds',
+                                      'Model + calibration time per micro-batch', LATENCY_BUCKETS)
+
+    def render(self, queue_depth: int) -> str:
+        lines = [
+            '# HELP crews_requests_total Scoring requests received',
+            '# TYPE crews_requests_total counter',
+            f'crews_requests_total {self.requests}',
+            '# HELP crews_request_errors_total Requests rejected or failed',
+            '# TYPE crews_request_errors_total counter',
+            f'crews_request_errors_total {self.errors}',
+            '# HELP crews_batches_total Micro-batches scored',
+            '# TYPE crews_batches_total counter',
+            f'crews_batches_total {self.batches}',
+            '# HELP crews_queue_depth Requests waiting to be batched',
+            '# TYPE crews_queue_depth gauge',
+            f'crews_queue_depth {queue_depth}',
+        ]
+        for histogram in (self.batch_size, self.latency, self.predict_time):
+            lines += histogram.render()
+        return '\n'.join(lines) + '\n'
+
+
+# =============================================================================
+# Micro-batching
+# =============================================================================
+
+class MicroBatcher:
+    """
+    Coalesce concurrent single-row requests into batches scored by ``score_fn``.
+
+    ``score_fn(X)`` takes an (n, n_features) float32 matrix and returns n PDs; it
+    runs on a dedicated worker thread, one batch at a time.
+    """
+
+    def __init__(self, score_fn, max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS,
+                 metrics: ServerMetrics = None):
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.metrics = metrics or ServerMetrics()
+        self.queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='crew-score')
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=False)
+
+    async def submit(self, x: np.ndarray) -> float:
+        """Queue one (n_features,) row and wait for its PD."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((x, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> list:
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            X = np.stack([item[0] for item in batch])
+            t0 = time.perf_counter()
+            try:
+                scores = await loop.run_in_executor(self._executor, self.score_fn, X)
+            except Exception as exc:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            done = time.perf_counter()
+
+            self.metrics.batches += 1
+            self.metrics.batch_size.observe(len(batch))
+            self.metrics.predict_time.observe(done - t0)
+            for (_, future, enqueued), score in zip(batch, scores):
+                self.metrics.latency.observe(done - enqueued)
+                if not future.done():
+                    future.set_result(float(score))
+
+
+# =============================================================================
+# Scoring service
+# =============================================================================
+
+class RiskBands:
+    """``model_card.json`` risk bands, looked up by lower bound."""
+
+    def __init__(self, bands: dict):
+        ordered = sorted(bands.items(), key=lambda kv: kv[1]['min_probability'])
+        self.names = [name for name, _ in ordered]
+        self.actions = [details.get('action', '') for _, details in ordered]
+        self.lower = np.array([details['min_probability'] for _, details in ordered])
+
+    def lookup(self, pd_score: float) -> tuple:
+        i = max(int(np.searchsorted(self.lower, pd_score, side='right')) - 1, 0)
+        return self.names[i], self.actions[i]
+
+
+class ScoringService:
+    """Model artifacts + micro-batcher behind the HTTP endpoints."""
+
+    def __init__(self, template: ScoringTemplate, score_fn, bands: RiskBands, model_version: str = '',
+                 lgd: float = LGD, max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS):
+        self.template = template
+        self.bands = bands
+        self.model_version = model_version
+        self.lgd = lgd
+        self.metrics = ServerMetrics()
+        self.batcher = MicroBatcher(score_fn, max_batch_size, max_wait_ms, self.metrics)
+
+    @classmethod
+    def from_artifacts(cls, models_dir=MODELS_PATH, engine: str = 'xgboost', **kwargs):
+        """
+        Load the template, calibration table and model card from ``models_dir``.
+
+        ``engine='xgboost'`` scores with ``Booster.inplace_predict``; ``'numpy'``
+        uses the exported tree arrays (``models/xgb_trees.npz``, DECISION-040),
+        which must have been exported from the model file on disk.
+        """
+        models_dir = Path(models_dir)
+        calibration = load_current_table(models_dir)
+        if engine == 'numpy':
+            from .tree_export import MODEL_FILE, TREES_FILE, TreeEnsemble
+
+            ensemble = TreeEnsemble.load(models_dir / TREES_FILE.name)
+            if not ensemble.is_current(models_dir / MODEL_FILE.name):
+                raise ValueError(f"{TREES_FILE.name} was exported from a different model; "
+                                 "re-export it with python -m src.tree_export")
+
+            def score_fn(X):
+                return ensemble.predict(X, calibration)
+        elif engine == 'xgboost':
+            import joblib
+
+            with warnings.catch_warnings():
+                # Pickled XGBClassifier from an older xgboost release
+                warnings.simplefilter('ignore')
+                booster = joblib.load(models_dir / 'xgb_credit_model.pkl').get_booster()
+
+            def score_fn(X):
+                return ScoringTemplate.predict(booster, X, calibration)
+        else:
+            raise ValueError(f"Unknown engine '{engine}'; expected 'xgboost' or 'numpy'")
+
+        template = ScoringTemplate.from_artifacts(models_dir)
+        with open(models_dir / 'model_card.json', encoding='utf-8') as f:
+            card = json.load(f)
+        return cls(template, score_fn, RiskBands(card['risk_bands']),
+                   card.get('model_metadata', {}).get('model_version', ''), **kwargs)
+
+    def parse_application(self, payload) -> tuple:
+        """Validate one application; returns (feature row, inputs). Raises ``ValueError``."""
+        if not isinstance(payload, dict):
+            raise ValueError("Expected a JSON object with one application")
+        missing = [c for c in CALCULATOR_INPUTS if c not in payload]
+        if missing:
+            raise ValueError(f"Missing required fields: {', '.join(missing)}")
+        try:
+            inputs = {c: float(payload[c]) for c in CALCULATOR_INPUTS}
+            income = float(payload['AMT_INCOME_TOTAL']) if payload.get('AMT_INCOME_TOTAL') is not None else None
+        except (TypeError, ValueError):
+            raise ValueError("Application fields must be numeric") from None
+        x = self.template.application_vector(inputs['EXT_SOURCE'], inputs['AGE_YEARS'],
+                                             inputs['AMT_CREDIT'], inputs['AMT_ANNUITY'], income)
+        return x[0], inputs
+
+    async def score(self, payload) -> dict:
+        x, inputs = self.parse_application(payload)
+        pd_score = await self.batcher.submit(x)
+        band, action = self.bands.lookup(pd_score)
+        result = {
+            'pd': pd_score,
+            'risk_band': band,
+            'action': action,
+            'ecl': inputs['AMT_CREDIT'] * pd_score * self.lgd,
+            'model_version': self.model_version,
+        }
+        if payload.get(ID_COLUMN) is not None:
+            result = {ID_COLUMN: payload[ID_COLUMN], **result}
+        return result
+
+    def health(self) -> dict:
+        return {'status': 'ok', 'model_version': self.model_version,
+                'queue_depth': self.batcher.queue.qsize(),
+                'latency_p99_le_seconds': self.metrics.latency.quantile(0.99)}
+
+    # -------------------------------------------------------------------------
+    # HTTP/1.1 (keep-alive) on asyncio streams
+    # -------------------------------------------------------------------------
+
+    async def _route(self, method: str, path: str, body: bytes) -> tuple:
+        if path == '/score':
+            if method != 'POST':
+                return 405, 'application/json', {'error': 'Use POST'}
+            self.metrics.requests += 1
+            try:
+                return 200, 'application/json', await self.score(json.loads(body or b'null'))
+            except (ValueError, json.JSONDecodeError) as exc:
+                self.metrics.errors += 1
+                return 400, 'application/json', {'error': str(exc)}
+            except Exception as exc:
+                self.metrics.errors += 1
+                return 500, 'application/json', {'error': f'Scoring failed: {exc}'}
+        if method != 'GET':
+            return 405, 'application/json', {'error': 'Use GET'}
+        if path == '/metrics':
+            return 200, 'text/plain; version=0.0.4', self.metrics.render(self.batcher.queue.qsize())
+        if path == '/health':
+            return 200, 'application/json', self.health()
+        return 404, 'application/json', {'error': f'No route for {path}'}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = headers.get('content-length', '') or '0'
+                if not (length.isascii() and length.isdigit()):
+                    # Malformed or negative: the body boundary is unknown, so close after replying
+                    status, content_type, payload = 400, 'application/json', {'error': 'Invalid Content-Length'}
+                    keep_alive = False
+                elif int(length) > MAX_BODY_BYTES:
+                    status, content_type, payload = 413, 'application/json', {'error': 'Body too large'}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(int(length))
+                    status, content_type, payload = await self._route(method, target.split('?')[0], body)
+                    keep_alive = (version == 'HTTP/1.1'
+                                  and headers.get('connection', '').lower() != 'close')
+
+                data = payload if isinstance(payload, str) else json.dumps(payload)
+                data = data.encode('utf-8')
+                writer.write(
+                    f'HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n'
+                    f'Content-Type: {content_type}\r\nContent-Length: {len(data)}\r\n'
+                    f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode('latin-1') + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8080) -> asyncio.AbstractServer:
+        self.batcher.start()
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def stop(self, server: asyncio.AbstractServer):
+        server.close()
+        await server.wait_closed()
+        await self.batcher.stop()
+
+
+# =============================================================================
+# Load test
+# =============================================================================
+
+async def _client(host: str, port: int, bodies: list, latencies: list):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for body in bodies:
+            t0 = time.perf_counter()
+            writer.write(f'POST /score HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n'
+                         f'Content-Length: {len(body)}\r\n\r\n'.encode('latin-1') + body)
+            await writer.drain()
+            await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':', 1)[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - t0)
+    finally:
+        writer.close()
+
+
+async def run_load_test(service: ScoringService, n_requests: int = 5000, concurrency: int = 64,
+                        seed: int = 42) -> dict:
+    """Drive ``service`` with ``concurrency`` keep-alive clients; returns throughput and latency quantiles."""
+    rng = np.random.default_rng(seed)
+    bodies = [json.dumps({
+        ID_COLUMN: i,
+        'EXT_SOURCE': float(rng.uniform(0.05, 0.95)),
+        'AGE_YEARS': int(rng.integers(21, 70)),
+        'AMT_CREDIT': float(rng.uniform(20_000, 1_500_000)),
+        'AMT_ANNUITY': float(rng.uniform(1_000, 60_000)),
+    }).encode('utf-8') for i in range(n_requests)]
+
+    server = await service.start('127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    latencies = []
+    try:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(_client('127.0.0.1', port, bodies[i::concurrency], latencies)
+                               for i in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+    finally:
+        await service.stop(server)
+
+    latencies = np.asarray(latencies)
+    return {
+        'requests': len(latencies),
+        'seconds': elapsed,
+        'throughput': len(latencies) / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p99_ms': float(np.percentile(latencies, 99) * 1000),
+        'mean_batch_size': service.metrics.batch_size.sum / max(service.metrics.batches, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-batching PD scoring server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--models-dir', default=str(MODELS_PATH))
+    parser.add_argument('--engine', choices=['xgboost', 'numpy'], default='xgboost')
+    parser.add_argument('--max-batch-size', type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS)
+    parser.add_argument('--lgd', type=float, default=LGD)
+    parser.add_argument('--load-test', action='store_true',
+                        help='Benchmark micro-batching against one-row-per-call scoring, then exit')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--slo-ms', type=float, default=50.0, help='p99 latency objective for --load-test')
+    args = parser.parse_args()
+
+    def make_service(max_batch_size, max_wait_ms):
+        return ScoringService.from_artifacts(args.models_dir, args.engine, lgd=args.lgd,
+                                             max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+
+    if args.load_test:
+        for label, size, wait in (('one row per call', 1, 0.0),
+                                  ('micro-batched', args.max_batch_size, args.max_wait_ms)):
+            stats = asyncio.run(run_load_test(make_service(size, wait), args.requests, args.concurrency))
+            verdict = 'OK' if stats['p99_ms'] <= args.slo_ms else 'MISSED'
+            print(f"{label:>16}: {stats['throughput']:8,.0f} req/s  p50 {stats['p50_ms']:6.1f} ms  "
+                  f"p99 {stats['p99_ms']:6.1f} ms ({verdict} vs {args.slo_ms:g} ms SLO)  "
+                  f"mean batch {stats['mean_batch_size']:.1f}")
+        return
+
+    service = make_service(args.max_batch_size, args.max_wait_ms)
+
+    async def serve():
+        server = await service.start(args.host, args.port)
+        print(f"Scoring server on http://{args.host}:{args.port} "
+              f"(engine {args.engine}, batch <= {args.max_batch_size}, window {args.max_wait_ms:g} ms)")
+        try:
+            await server.serve_forever()
+        finally:
+            await service.stop(server)
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Cold-start instrumentation and background warm-up for the dashboard.
+
+``startup_metrics`` records how long each startup phase (heavy imports, artifact
+loads) took the first time it ran in this process and the time to first paint,
+i.e. the end of the first complete script run. ``run_in_background`` starts
+expensive, not-yet-needed work (model load, SHAP explainer) on a daemon thread
+and hands back a ``Future`` the UI can poll or wait on.
+
+Only the standard library is imported here, so app.py can import this module
+before any heavy dependency and time those imports too.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class StartupMetrics:
+    """First-occurrence timings of named startup phases, plus time to first paint."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.first_paint = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a block; only the first run per process is kept (reruns hit warm caches)."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            with self._lock:
+                self.phases.setdefault(name, elapsed)
+
+    def mark_first_paint(self):
+        """Record seconds from the first import of this module to the end of the first script run."""
+        with self._lock:
+            if self.first_paint is not None:
+                return
+            self.first_paint = time.perf_counter() - self.started
+        logger.info("First paint after %.2fs (%s)", self.first_paint, self.format_phases())
+
+    def import_seconds(self) -> float:
+        return sum(v for k, v in self.phases.items() if k.startswith('import:'))
+
+    def format_phases(self) -> str:
+        return ', '.join(f'{name} {secs:.2f}s' for name, secs in self.phases.items())
+
+
+startup_metrics = StartupMetrics()
+
+
+def run_in_background(fn, name: str) -> Future:
+    """Run ``fn()`` on a daemon thread and return a ``Future`` for its result; timed as a phase."""
+    future = Future()
+
+    def target():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            with startup_metrics.phase(f'background: {name}'):
+                result = fn()
+            future.set_result(result)
+        except BaseException as exc:
+            future.set_exception(exc)
+
+    threading.Thread(target=target, name=f'crew-{name}', daemon=True).start()
+    return future
@@ -0,0 +1,268 @@
+"""
+Array-backed export of the XGBoost credit model and a pure-NumPy evaluator.
+
+``export_booster`` flattens every tree of the booster's JSON dump into
+contiguous arrays of split features, thresholds and leaf values, laid out as
+complete binary heaps so children are found arithmetically (``2h+1``, ``2h+2``).
+``TreeEnsemble`` walks all trees for a whole batch level by level, ``depth``
+times, with no per-node branching: a single row is scored without DMatrix
+construction or XGBoost's thread pool. Split semantics follow XGBoost: go left
+when ``x < threshold`` (float32), and take the default branch when ``x`` is NaN.
+
+The arrays are saved as ``models/xgb_trees.npz`` together with the SHA-256 of
+the pickled model they came from, so a retrained model is detected as stale.
+
+Usage:
+    python -m src.tree_export                       # export + parity check
+    python -m src.tree_export --rows 20000 --tol 1e-6
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+MODELS_PATH = Path(__file__).resolve().parent.parent / 'models'
+MODEL_FILE = MODELS_PATH / 'xgb_credit_model.pkl'
+TREES_FILE = MODELS_PATH / 'xgb_trees.npz'
+PARITY_TOL = 1e-6
+
+
+def file_sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _parse_base_score(value) -> float:
+    """``base_score`` is stored as a string, bracketed (``'[5E-1]'``) since xgboost 3.x."""
+    return float(str(value).strip('[]').split(',')[0])
+
+
+class TreeEnsemble:
+    """
+    Flattened binary-logistic tree ensemble evaluated with NumPy only.
+
+    Every tree is padded to a complete binary heap of ``depth`` levels:
+    ``split_feature`` / ``split_threshold`` hold ``2**depth - 1`` internal nodes
+    per tree and ``leaf_value`` holds ``2**depth`` leaves per tree (a leaf above
+    the last level is repeated across all its padded descendants). The missing
+    value direction is folded into ``split_feature``: indices ``>= n_features``
+    read a copy of X whose NaNs are ``+inf`` (default right), the others a copy
+    whose NaNs are ``-inf`` (default left). One level is then three gathers and
+    one comparison for all trees at once.
+    """
+
+    ARRAYS = ('split_feature', 'split_threshold', 'leaf_value')
+
+    def __init__(self, split_feature, split_threshold, leaf_value, depth: int,
+                 base_margin: float, n_features: int, source_sha256: str = ''):
+        self.split_feature = np.asarray(split_feature, dtype=np.int32)
+        self.split_threshold = np.asarray(split_threshold, dtype=np.float32)
+        self.leaf_value = np.asarray(leaf_value, dtype=np.float32)
+        self.depth = int(depth)
+        self.base_margin = float(base_margin)
+        self.n_features = int(n_features)
+        self.source_sha256 = source_sha256
+
+        n_internal = 2 ** self.depth - 1
+        self.n_trees = len(self.split_threshold) // n_internal
+        self._internal_base = np.arange(self.n_trees, dtype=np.intp) * n_internal
+        self._internal_base_m1 = self._internal_base - 1
+        self._leaf_base = np.arange(self.n_trees, dtype=np.intp) * (n_internal + 1) - n_internal
+
+    def _missing_as_inf(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {X.shape[1]}")
+        missing = np.isnan(X)
+        return np.hstack([np.where(missing, -np.inf, X), np.where(missing, np.inf, X)])
+
+    def leaf_index(self, X: np.ndarray) -> np.ndarray:
+        """(n_rows, n_trees) index into ``leaf_value`` of the leaf each row reaches in each tree."""
+        Xc = self._missing_as_inf(X)
+        # Flat offsets in np.intp: rows x (2 * n_features) passes 2**31 at a few million rows
+        row_offset = (np.arange(len(Xc), dtype=np.intp) * Xc.shape[1])[:, np.newaxis]
+        flat = Xc.ravel()
+        # node = tree base + heap position h; h -> 2h + 1 + go_right
+        node = np.broadcast_to(self._internal_base, (len(Xc), self.n_trees))
+        for _ in range(self.depth):
+            go_right = flat[row_offset + self.split_feature[node]] >= self.split_threshold[node]
+            node = 2 * node - self._internal_base_m1 + go_right
+        return node - self._internal_base + self._leaf_base
+
+    def predict_margin(self, X: np.ndarray) -> np.ndarray:
+        # Sequential float32 accumulation over trees, as XGBoost does (pairwise or
+        # float64 sums drift by ~3e-7, which steep calibration segments amplify)
+        leaves = self.leaf_value[self.leaf_index(X)]
+        return self.base_margin + np.cumsum(leaves, axis=1, dtype=np.float32)[:, -1]
+
+    def predict(self, X: np.ndarray, calibration=None) -> np.ndarray:
+        """
+        Default probability per row (equals ``predict_proba(X)[:, 1]``), mapped
+        through ``calibration`` (a ``CalibrationTable``) when given.
+        """
+        raw = 1.0 / (1.0 + np.exp(-self.predict_margin(X)))
+        return raw if calibration is None else calibration.apply(raw)
+
+    def save(self, path=TREES_FILE):
+        np.savez_compressed(
+            path, **{name: getattr(self, name) for name in self.ARRAYS},
+            meta=np.array(json.dumps({
+                'depth': self.depth, 'base_margin': self.base_margin,
+                'n_features': self.n_features, 'source_sha256': self.source_sha256,
+            })),
+        )
+
+    @classmethod
+    def load(cls, path=TREES_FILE):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            return cls(*(data[name] for name in cls.ARRAYS), **meta)
+
+    def is_current(self, model_path=MODEL_FILE) -> bool:
+        """True if the arrays were exported from the model file currently on disk."""
+        return bool(self.source_sha256) and self.source_sha256 == file_sha256(model_path)
+
+
+def _tree_depth(left, right) -> int:
+    depth, frontier = 0, [0]
+    while True:
+        frontier = [c for i in frontier if left[i] != -1 for c in (left[i], right[i])]
+        if not frontier:
+            return depth
+        depth += 1
+
+
+def export_booster(booster, source_sha256: str = '') -> TreeEnsemble:
+    """Flatten a binary:logistic ``xgboost.Booster`` into a ``TreeEnsemble``."""
+    model = json.loads(booster.save_raw('json'))['learner']
+    objective = model['objective']['name']
+    if objective != 'binary:logistic':
+        raise ValueError(f"Only binary:logistic models are supported, got '{objective}'")
+    params = model['learner_model_param']
+    n_features = int(params['num_feature'])
+    base_score = _parse_base_score(params['base_score'])
+    trees = model['gradient_booster']['model']['trees']
+    if any(any(tree['split_type']) for tree in trees):
+        raise ValueError("Categorical splits are not supported")
+
+    depth = max(_tree_depth(t['left_children'], t['right_children']) for t in trees)
+    n_internal, n_leaves = 2 ** depth - 1, 2 ** depth
+    feature = np.zeros((len(trees), n_internal), dtype=np.int32)
+    threshold = np.zeros((len(trees), n_internal), dtype=np.float32)
+    value = np.zeros((len(trees), n_leaves), dtype=np.float32)
+
+    for t, tree in enumerate(trees):
+        left, right = tree['left_children'], tree['right_children']
+        cond = np.asarray(tree['split_conditions'], dtype=np.float32)
+        stack = [(0, 0, 0)]  # (node, heap position, level)
+        while stack:
+            node, h, level = stack.pop()
+            if left[node] == -1:
+                # Leaf: repeat its value over every last-level slot below it
+                span = 2 ** (depth - level)
+                first = h * span + span - 1 - n_internal
+                value[t, first:first + span] = cond[node]
+                continue
+            feature[t, h] = tree['split_indices'][node] + (0 if tree['default_left'][node] else n_features)
+            threshold[t, h] = cond[node]
+            stack += [(left[node], 2 * h + 1, level + 1), (right[node], 2 * h + 2, level + 1)]
+
+    return TreeEnsemble(
+        feature.ravel(), threshold.ravel(), value.ravel(), depth=depth,
+        base_margin=float(np.log(base_score / (1 - base_score))),
+        n_features=n_features, source_sha256=source_sha256,
+    )
+
+
+def load_model(model_path=MODEL_FILE):
+    import joblib
+
+    with warnings.catch_warnings():
+        # Pickled XGBClassifier from an older xgboost release
+        warnings.simplefilter('ignore')
+        return joblib.load(model_path)
+
+
+def export_model(model_path=MODEL_FILE, out_path=TREES_FILE) -> TreeEnsemble:
+    """Export the pickled classifier at ``model_path`` and save the arrays to ``out_path``."""
+    ensemble = export_booster(load_model(model_path).get_booster(), file_sha256(model_path))
+    ensemble.save(out_path)
+    return ensemble
+
+
+def parity_sample(ensemble: TreeEnsemble, n_rows: int = 5000, seed: int = 42) -> np.ndarray:
+    """
+    Rows that exercise every split: per feature, a mix of values spread over its
+    split-threshold range, values exactly on a threshold, and NaNs.
+    """
+    rng = np.random.default_rng(seed)
+    X = rng.standard_normal((n_rows, ensemble.n_features)).astype(np.float32)
+    used = ensemble.split_threshold != 0
+    split_on = ensemble.split_feature % ensemble.n_features
+    for f in range(ensemble.n_features):
+        thresholds = ensemble.split_threshold[used & (split_on == f)]
+        if len(thresholds) == 0:
+            continue
+        lo, hi = thresholds.min(), thresholds.max()
+        span = max(hi - lo, abs(hi), 1.0)
+        X[:, f] = rng.uniform(lo - 0.1 * span, hi + 0.1 * span, n_rows)
+        exact = rng.random(n_rows) < 0.1
+        X[exact, f] = rng.choice(thresholds, exact.sum())
+    X[rng.random(X.shape) < 0.05] = np.nan
+    return X
+
+
+def parity_check(model, ensemble: TreeEnsemble, X: np.ndarray) -> float:
+    """Max absolute difference between ``model.predict_proba(X)[:, 1]`` and the NumPy evaluator."""
+    reference = model.predict_proba(X)[:, 1]
+    return float(np.max(np.abs(reference - ensemble.predict(X))))
+
+
+def _latency_us(fn, x, repeats: int = 300) -> float:
+    fn(x)
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        fn(x)
+    return (time.perf_counter() - t0) / repeats * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the XGBoost model to NumPy arrays and check parity.')
+    parser.add_argument('--model', default=str(MODEL_FILE))
+    parser.add_argument('--out', default=str(TREES_FILE))
+    parser.add_argument('--rows', type=int, default=5000, help='Synthetic rows for the parity check')
+    parser.add_argument('--tol', type=float, default=PARITY_TOL)
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    ensemble = export_booster(model.get_booster(), file_sha256(args.model))
+    ensemble.save(args.out)
+    print(f"Exported {ensemble.n_trees} trees (depth {ensemble.depth}, "
+          f"{len(ensemble.leaf_value):,} leaf slots) -> {args.out}")
+
+    X = parity_sample(ensemble, args.rows)
+    max_diff = parity_check(model, TreeEnsemble.load(args.out), X)
+    print(f"Parity vs predict_proba on {args.rows:,} rows: max |diff| = {max_diff:.2e} (tol {args.tol:.0e})")
+
+    booster = model.get_booster()
+    row = X[:1]
+    print(f"Single-row latency: inplace_predict {_latency_us(booster.inplace_predict, row):.0f} us, "
+          f"NumPy evaluator {_latency_us(ensemble.predict, row):.0f} us")
+
+    if max_diff > args.tol:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# Tests import the project modules as ``src.*`` whatever directory pytest is started from
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
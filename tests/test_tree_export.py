@@ -0,0 +1,42 @@
+"""
+Parity of the exported tree arrays (``models/xgb_trees.npz``) with the XGBoost model.
+
+Fails when the export is stale (the model was retrained without re-running
+``python -m src.tree_export``) or when the NumPy evaluator drifts from
+``predict_proba``.
+"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip('xgboost')
+
+from src.tree_export import (  # noqa: E402
+    MODEL_FILE, PARITY_TOL, TREES_FILE, TreeEnsemble, load_model, parity_check, parity_sample,
+)
+
+
+@pytest.fixture(scope='module')
+def ensemble():
+    return TreeEnsemble.load(TREES_FILE)
+
+
+@pytest.fixture(scope='module')
+def model():
+    return load_model(MODEL_FILE)
+
+
+def test_export_matches_model_file(ensemble):
+    assert ensemble.is_current(MODEL_FILE), "xgb_trees.npz is stale; re-run python -m src.tree_export"
+
+
+def test_parity_with_predict_proba(model, ensemble):
+    X = parity_sample(ensemble, n_rows=5000)
+    assert parity_check(model, ensemble, X) <= PARITY_TOL
+
+
+def test_single_row_and_all_missing(model, ensemble):
+    X = np.vstack([parity_sample(ensemble, n_rows=1, seed=7),
+                   np.full((1, ensemble.n_features), np.nan, dtype=np.float32)])
+    for row in X:
+        assert parity_check(model, ensemble, row[np.newaxis, :]) <= PARITY_TOL